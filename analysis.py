@@ -0,0 +1,228 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from document_store import get_document_store
+from extractive import EXTRACTIVE_PREVIEW_SENTENCES, preview_summary
+from jobs import collect_stream, report
+from summarizer import (
+    _extraction_key, can_combine, extract_key_points, extract_text_from_pdf, generate_combined,
+    generate_mindmap_data, get_summary_memo, reduce_document, summarize_pdf_streaming, summarize_text, summarize_text_stream,
+    translate_artifacts, translate_text, translate_text_stream
+)
+from tracing import propagate, span, trace
+
+# Options that change the result; "stream" only changes how it is produced
+RESULT_OPTIONS = ("ocr", "audience", "length", "language", "key_points", "mindmap", "combined", "direct")
+
+
+def job_key(doc_hash, options):
+    return json.dumps([doc_hash, {k: options[k] for k in RESULT_OPTIONS}], sort_keys=True)
+
+
+def run_analysis(pdf_file, doc_hash, filename, options):
+    """The Generate pipeline, meant to run as a background job.
+
+    Reports its ``stage``, pages read and sections summarized through
+    jobs.report/advance, and streams the final summary as the job's partial
+    output when ``options["stream"]`` is set. Returns ``summary``,
+    ``key_points``, ``mindmap``, ``metadata``, the stored ``document`` and
+    any ``warnings``; raises with a user-facing message on failure.
+    """
+    with trace("generate") as run_trace:
+        result = _analyze(pdf_file, doc_hash, filename, options)
+    result["metadata"]["stages"] = run_trace.summary()
+    return result
+
+
+def _analyze(pdf_file, doc_hash, filename, options):
+    audience, length, language = options["audience"], options["length"], options["language"]
+    # Direct: every artifact is written in the target language, no translation
+    # pass. Otherwise English results are translated together at the end.
+    direct = options["direct"] and language != "english"
+    artifact_language = language if direct else "english"
+    warnings = []
+
+    # Reuse intermediate results for this document: a length change costs only
+    # the final summary, a language change one translation (or one direct summary)
+    memo = get_summary_memo()
+    # Keyed on the extracted text's identity, not the upload: OCR changes the text
+    text_key = _extraction_key(doc_hash, options["ocr"])
+    partial_summaries = memo.get(("map", text_key, audience))
+    reduced = memo.get(("reduce", text_key, audience))
+    english_summary = None if direct else memo.get(("summary", text_key, audience, length))
+    final_key = ("direct" if direct else "translation", text_key, audience, length, language)
+    final_summary = memo.get(final_key)
+    reused = [name for name, value in (
+        ("map", partial_summaries), ("reduce", reduced),
+        ("summary", english_summary), ("direct summary" if direct else "translation", final_summary)
+    ) if value is not None]
+
+    stream_map = options["stream"] and not options["combined"] and partial_summaries is None and reduced is None
+    report(stage="extract_map" if stream_map else "extract")
+    extractive = {}
+
+    def show_preview(text):
+        # Key sentences picked locally, shown while the AI summary is written
+        if EXTRACTIVE_PREVIEW_SENTENCES > 0 and final_summary is None:
+            with span("preview"):
+                report(preview=preview_summary(text))
+
+    if stream_map:
+        # The preview goes out once pages are read, before the map calls finish
+        text, page_count, cache_hit, partial_summaries = summarize_pdf_streaming(
+            pdf_file, options["ocr"], audience, extractive, on_text=show_preview
+        )
+        if partial_summaries and all(partial_summaries):
+            memo.put(("map", text_key, audience), partial_summaries)
+    else:
+        text, page_count, cache_hit = extract_text_from_pdf(pdf_file, options["ocr"])
+        if text:
+            show_preview(text)
+
+    if not text:
+        raise ValueError("Could not extract text. Try enabling OCR.")
+
+    # One compressed copy per document across sessions; its retrieval
+    # index for chat is built once and shared too
+    report(stage="index")
+    store = get_document_store()
+    document = store.put(text)
+    doc_index = document.index
+
+    word_count = len(text.split())
+    metadata = {
+        "filename": filename,
+        "doc_hash": doc_hash,
+        "word_count": word_count,
+        "page_count": page_count,
+        "reading_time": max(1, round(word_count / 200)),
+        "audience": audience,
+        "length": length,
+        "language": language,
+        "extraction_cache": "hit" if cache_hit else "miss",
+        "index_chunks": len(doc_index.chunks),
+        "index_seconds": store.index_seconds(document.key),
+        "reused": reused
+    }
+    result = {"summary": None, "key_points": None, "mindmap": None, "metadata": metadata,
+              "document": document, "warnings": warnings}
+
+    # Short documents can get all three results from one structured call
+    combined = None
+    if options["combined"] and english_summary is None and final_summary is None and can_combine(text):
+        report(stage="combined")
+        try:
+            combined = generate_combined(
+                text, audience, length, options["key_points"], options["mindmap"], language=artifact_language
+            )
+        except Exception:
+            combined = None
+        if combined:
+            if direct:
+                final_summary = combined["summary"]
+                memo.put(final_key, final_summary)
+            else:
+                english_summary = combined["summary"]
+                memo.put(("summary", text_key, audience, length), english_summary)
+            reduced = (text, {"depth": 1, "calls": 1, "chunks": 1, "failed": 0})
+            result["key_points"] = combined.get("key_points")
+            result["mindmap"] = combined.get("mindmap")
+
+    # Key points and mind map only need the text, so they run alongside the summary
+    with ThreadPoolExecutor(max_workers=2) as side_pool:
+        side_tasks = {}
+        if not combined and options["key_points"]:
+            side_tasks["key points"] = side_pool.submit(
+                propagate(extract_key_points), text, language=artifact_language
+            )
+        if not combined and options["mindmap"]:
+            side_tasks["mind map"] = side_pool.submit(
+                propagate(generate_mindmap_data), text, language=artifact_language
+            )
+
+        if reduced is None and final_summary is None:
+            report(stage="reduce")
+            reduced = reduce_document(text, audience, partial_summaries)
+            summary_input, tree = reduced
+            if tree["failed"]:
+                warnings.append(f"{tree['failed']} of {tree['chunks']} sections could not be summarized")
+            elif summary_input:
+                memo.put(("reduce", text_key, audience), reduced)
+        summary_input, tree = reduced or (None, None)
+        if tree and extractive:
+            tree = dict(tree, extractive=extractive)
+        metadata["summary_tree"] = tree
+
+        # Final summary (in English unless direct); streamed token by token if enabled
+        if final_summary is None and (direct or english_summary is None) and summary_input:
+            report(stage="summary")
+            if options["stream"]:
+                timing = {}
+                summary = collect_stream(
+                    summarize_text_stream(summary_input, audience, length, timing, artifact_language)
+                )
+                metadata["summary_ttft"] = timing.get("ttft")
+            else:
+                with span("summary"):
+                    summary = summarize_text(summary_input, audience, length, artifact_language)
+            if summary and direct:
+                final_summary = summary
+                memo.put(final_key, final_summary)
+            elif summary:
+                english_summary = summary
+                memo.put(("summary", text_key, audience, length), english_summary)
+        if language == "english":
+            final_summary = final_summary or english_summary
+
+        if side_tasks:
+            report(stage="side_tasks")
+        for name, future in side_tasks.items():
+            try:
+                value = future.result()
+            except Exception as e:
+                warnings.append(f"Could not generate {name}: {str(e)}")
+                continue
+            if value and name == "key points":
+                result["key_points"] = value
+            elif value:
+                result["mindmap"] = value
+
+    if not direct and language != "english":
+        final_summary = _translate(result, english_summary, final_summary, language, options["stream"], warnings)
+        if final_summary:
+            memo.put(final_key, final_summary)
+
+    if not final_summary:
+        raise RuntimeError("Failed to generate summary")
+    result["summary"] = final_summary
+    return result
+
+
+def _translate(result, english_summary, final_summary, language, stream, warnings):
+    """Translate the English artifacts still needing it, in one call when there
+    are several; key points and mind map are updated in ``result``. Returns
+    the translated summary."""
+    pending = {"key_points": result["key_points"], "mindmap": result["mindmap"]}
+    if final_summary is None:
+        pending["summary"] = english_summary
+    pending = {name: value for name, value in pending.items() if value}
+    if not pending:
+        return final_summary
+
+    report(stage="translate")
+    if list(pending) == ["summary"]:
+        if stream:
+            return collect_stream(translate_text_stream(english_summary, language))
+        return translate_text(english_summary, language)
+
+    translated = translate_artifacts(language, **pending)
+    if translated is None:
+        # One round trip per artifact; mind-map labels stay in English
+        translated = {name: translate_text(pending[name], language)
+                      for name in ("summary", "key_points") if name in pending}
+        if "mindmap" in pending:
+            warnings.append("Mind map labels could not be translated")
+    for name in ("key_points", "mindmap"):
+        if translated.get(name):
+            result[name] = translated[name]
+    return translated.get("summary") or final_summary
@@ -1,7 +1,5 @@
 import streamlit as st
-import os
-import io
-import json
+import hashlib
 from datetime import datetime
 
 # Page config
@@ -12,55 +10,60 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
+# Load environment once per process (before imports: modules read their settings on import)
+@st.cache_resource
+def load_environment():
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+
+load_environment()
+
 # Import libraries
 try:
-    import PyPDF2
-    from groq import Groq
+    from llm import API_KEY_ENV, configure_client, default_api_key, get_response_cache, get_scheduler
+    from summarizer import OCR_AVAILABLE, get_extraction_cache
+    from chat import ConversationMemory, append_turn, chat_with_document, chat_with_document_stream
+    from document_store import get_document_store
+    from jobs import ACTIVE, JOB_POLL_SECONDS, get_job_queue
+    from analysis import job_key, run_analysis
+    from tracing import merge_summaries, start_metrics_server, trace
 except ImportError as e:
     st.error(f"Missing required library: {str(e)}")
     st.stop()
 
-# Optional imports
-try:
-    import pytesseract
-    from pdf2image import convert_from_bytes
-    from PIL import Image
-    OCR_AVAILABLE = True
-except ImportError:
-    OCR_AVAILABLE = False
-
-try:
-    import pdfplumber
-    PDFPLUMBER_AVAILABLE = True
-except ImportError:
-    PDFPLUMBER_AVAILABLE = False
-
-# Load environment
-try:
-    from dotenv import load_dotenv
-    load_dotenv()
-except ImportError:
-    pass
-
 # Get API key
-GROQ_API_KEY = None
+API_KEY = None
 try:
-    GROQ_API_KEY = st.secrets.get("GROQ_API_KEY")
+    API_KEY = st.secrets.get("LLM_API_KEY") or st.secrets.get(API_KEY_ENV)
 except:
     pass
-if not GROQ_API_KEY:
-    GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+if not API_KEY:
+    API_KEY = default_api_key()
 
-if not GROQ_API_KEY:
-    st.error("❌ GROQ_API_KEY not found!")
+if not API_KEY:
+    st.error(f"❌ {API_KEY_ENV} not found!")
     st.stop()
 
+# One pooled client per process, shared by all sessions and reruns
+@st.cache_resource
+def get_groq_client(api_key):
+    return configure_client(api_key)
+
 try:
-    client = Groq(api_key=GROQ_API_KEY)
+    get_groq_client(API_KEY)
 except Exception as e:
     st.error(f"Failed to initialize Groq: {str(e)}")
     st.stop()
 
+# Prometheus /metrics on METRICS_PORT (off by default), once per process
+try:
+    start_metrics_server()
+except OSError as e:
+    st.warning(f"Metrics endpoint not started: {str(e)}")
+
 # ✨ Enhanced CSS with all improvements
 st.markdown("""
 <style>
@@ -516,11 +519,13 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Session state
-if 'document_text' not in st.session_state:
-    st.session_state.document_text = None
+# Session state (the document text itself lives in the shared document store)
+if 'document' not in st.session_state:
+    st.session_state.document = None
 if 'chat_history' not in st.session_state:
     st.session_state.chat_history = []
+if 'chat_memory' not in st.session_state:
+    st.session_state.chat_memory = ConversationMemory()
 if 'summary' not in st.session_state:
     st.session_state.summary = None
 if 'metadata' not in st.session_state:
@@ -529,171 +534,71 @@ if 'key_points' not in st.session_state:
     st.session_state.key_points = None
 if 'mindmap_data' not in st.session_state:
     st.session_state.mindmap_data = None
+if 'job_id' not in st.session_state:
+    st.session_state.job_id = None
+if 'job_notice' not in st.session_state:
+    st.session_state.job_notice = None
 
-# Helper functions
-def extract_text_from_pdf(pdf_file, use_ocr=False):
-    """Extract text from PDF with multiple methods"""
-    try:
-        text = ""
-        page_count = 0
-        
-        pdf_bytes = pdf_file.read()
-        pdf_file.seek(0)
-        
-        # Try PyPDF2
-        reader = PyPDF2.PdfReader(io.BytesIO(pdf_bytes))
-        page_count = len(reader.pages)
-        
-        for page in reader.pages:
-            page_text = page.extract_text()
-            if page_text and page_text.strip():
-                text += page_text + "\n"
-        
-        # Try pdfplumber if no text
-        if not text.strip() and PDFPLUMBER_AVAILABLE:
-            try:
-                import pdfplumber
-                with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
-                    for page in pdf.pages:
-                        page_text = page.extract_text()
-                        if page_text:
-                            text += page_text + "\n"
-            except:
-                pass
-        
-        # Try OCR if enabled
-        if not text.strip() and use_ocr and OCR_AVAILABLE:
-            try:
-                images = convert_from_bytes(pdf_bytes, first_page=1, last_page=min(10, page_count))
-                for img in images:
-                    text += pytesseract.image_to_string(img) + "\n"
-            except Exception as e:
-                st.warning(f"OCR failed: {str(e)}")
-        
-        return text.strip(), page_count
-    except Exception as e:
-        raise ValueError(f"Error reading PDF: {str(e)}")
-
-def chunk_text(text, max_chars=4000):
-    chunks = []
-    current_chunk = ""
-    paragraphs = text.split('\n\n')
-    
-    for para in paragraphs:
-        if len(current_chunk) + len(para) <= max_chars:
-            current_chunk += para + "\n\n"
-        else:
-            if current_chunk:
-                chunks.append(current_chunk.strip())
-            current_chunk = para + "\n\n"
-    
-    if current_chunk:
-        chunks.append(current_chunk.strip())
-    
-    return chunks
-
-def get_ai_response(system_prompt, user_prompt, max_tokens=1500):
-    try:
-        response = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            temperature=0.7,
-            max_tokens=max_tokens
-        )
-        return response.choices[0].message.content
-    except Exception as e:
-        st.error(f"API Error: {str(e)}")
-        return None
-
-def translate_text(text, target_language):
-    if target_language == "english":
-        return text
-    
-    language_map = {
-        "spanish": "Spanish", "chinese": "Chinese (Simplified)", "hindi": "Hindi",
-        "french": "French", "german": "German", "japanese": "Japanese",
-        "korean": "Korean", "arabic": "Arabic", "urdu": "Urdu", "portuguese": "Portuguese"
-    }
-    
-    system_prompt = f"You are a professional translator. Translate to {language_map.get(target_language, target_language)}."
-    return get_ai_response(system_prompt, f"Translate:\n\n{text}")
-
-def summarize_text(text, audience="general", length="medium", language="english"):
-    length_map = {
-        "short": "in 3–5 concise sentences",
-        "medium": "in 2–3 clear paragraphs",
-        "detailed": "in 4–5 detailed paragraphs with key insights"
-    }
-    
-    audience_map = {
-        "general": "for a general audience using clear language",
-        "ceo": "for executives focusing on strategic insights",
-        "lawyer": "for legal professionals highlighting clauses and risks",
-        "researcher": "for researchers emphasizing methodology and findings",
-        "student": "for students using simple, educational language"
-    }
-    
-    system_prompt = "You are an expert document analyst. Create comprehensive summaries."
-    user_prompt = f"Summarize this document {length_map[length]} {audience_map[audience]}:\n\n{text}"
-    
-    summary = get_ai_response(system_prompt, user_prompt, max_tokens=2000)
-    
-    if summary and language != "english":
-        summary = translate_text(summary, language)
-    
-    return summary
-
-def extract_key_points(text, num_points=7):
-    system_prompt = "You are an expert at identifying critical insights."
-    user_prompt = f"Extract {num_points} key points as a numbered list:\n\n{text[:5000]}"
-    return get_ai_response(system_prompt, user_prompt)
-
-def generate_mindmap_data(text):
-    system_prompt = "Create structured mind maps from documents."
-    user_prompt = f"""Create a mind map in JSON:
-    {{"central": "Main Topic", "branches": [{{"name": "Branch", "subbranches": ["Detail"]}}]}}
-    
-    Document: {text[:3000]}"""
-    
-    response = get_ai_response(system_prompt, user_prompt)
-    if not response:
-        return None
-    
-    try:
-        response = response.strip()
-        if "```json" in response:
-            response = response.split("```json")[1].split("```")[0]
-        elif "```" in response:
-            response = response.split("```")[1].split("```")[0]
-        return json.loads(response)
-    except:
-        return {
-            "central": "Document Analysis",
-            "branches": [{"name": "Main Points", "subbranches": ["Point 1", "Point 2"]}]
-        }
+STAGE_LABELS = {
+    "extract": "📖 Extracting text...",
+    "extract_map": "📖 Extracting text and summarizing sections...",
+    "index": "🔎 Indexing for chat...",
+    "combined": "🧩 Generating summary, key points and mind map...",
+    "reduce": "🤖 Generating AI summary...",
+    "summary": "🤖 Writing final summary...",
+    "translate": "🌐 Translating...",
+    "side_tasks": "🔑 Finishing key points and mind map..."
+}
 
-def chat_with_document(document_text, question, chat_history=[]):
-    system_prompt = f"You are an AI assistant. Answer based on:\n\n{document_text[:6000]}"
-    
-    messages = [{"role": "system", "content": system_prompt}]
-    for msg in chat_history[-5:]:
-        messages.append({"role": "user", "content": msg["question"]})
-        messages.append({"role": "assistant", "content": msg["answer"]})
-    messages.append({"role": "user", "content": question})
+# Polls the session's analysis job; reruns on its own until the job is done,
+# then moves the results into the session and reruns the whole app
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def show_job_progress():
+    job = get_job_queue().get(st.session_state.job_id) if st.session_state.job_id else None
+    if job is None:
+        if st.session_state.job_id:
+            st.session_state.job_id = None
+            st.session_state.job_notice = {"error": "The analysis expired. Please generate again."}
+            st.rerun()
+        return
     
-    try:
-        response = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=messages,
-            temperature=0.6,
-            max_tokens=1000
-        )
-        return response.choices[0].message.content
-    except Exception as e:
-        return f"Error: {str(e)}"
+    state = job.snapshot()
+    if state["status"] in ACTIVE:
+        progress = state["progress"]
+        if state["status"] == "queued":
+            label = "⏳ Waiting for a free worker..."
+        else:
+            label = STAGE_LABELS.get(progress.get("stage"), "⏳ Working...")
+        done, total = progress.get("chunks_done", 0), progress.get("chunks_total", 0)
+        st.progress(min(done / total, 1.0) if total else 0.0, text=label)
+        details = []
+        if progress.get("pages"):
+            details.append(f"{progress['pages']:,} pages read")
+        if total:
+            details.append(f"{done:,} of {total:,} sections summarized")
+        details.append(f"{state['elapsed']:.0f}s")
+        st.caption(" • ".join(details))
+        if state["partial"]:
+            st.markdown(f'<div class="summary-box">{state["partial"]}</div>', unsafe_allow_html=True)
+        elif progress.get("preview"):
+            st.caption("👀 Preview: key sentences from the document, while the AI summary is written")
+            st.markdown(f'<div class="summary-box">{progress["preview"]}</div>', unsafe_allow_html=True)
+        return
+    
+    st.session_state.job_id = None
+    if state["status"] == "error":
+        st.session_state.job_notice = {"error": state["error"]}
+    else:
+        result = state["result"]
+        # A handle of its own, so the document stays stored while this session uses it
+        st.session_state.document = get_document_store().open(result["document"].key)
+        st.session_state.summary = result["summary"]
+        st.session_state.key_points = result["key_points"]
+        st.session_state.mindmap_data = result["mindmap"]
+        st.session_state.metadata = dict(result["metadata"])
+        st.session_state.job_notice = {"warnings": result["warnings"]} if result["warnings"] else None
+        st.balloons()
+    st.rerun()
 
 # ========== MAIN UI ==========
 
@@ -743,86 +648,59 @@ with col_upload:
     with col_opt1:
         key_points_check = st.checkbox("🔑 Key Points", value=True)
         mindmap_check = st.checkbox("🗺️ Mind Map")
+        combined_check = st.checkbox(
+            "🧩 One request",
+            help="For short documents, get summary, key points and mind map from a single AI call"
+        )
     with col_opt2:
         ocr_check = st.checkbox("📸 OCR")
         if ocr_check and not OCR_AVAILABLE:
             st.caption("⚠️ OCR not installed")
+        stream_check = st.checkbox(
+            "⚡ Streaming", value=True,
+            help="Summarize sections while pages are still being read, and show answers as they are written"
+        )
+        direct_check = st.checkbox(
+            "✍️ Write in language", value=True,
+            help="Write every result directly in the chosen language instead of translating English results"
+        )
     
-    # Submit button
+    # Submit button: the analysis runs as a background job, so reruns and
+    # refreshes do not lose it, and the same input attaches to a running job
     if uploaded_file:
         if st.button("✨ Generate Summary", use_container_width=True, type="primary"):
-            # Reset
+            doc_hash = hashlib.sha256(uploaded_file.getbuffer()).hexdigest()
+            options = {
+                "ocr": ocr_check,
+                "audience": audience,
+                "length": summary_length,
+                "language": language,
+                "key_points": key_points_check,
+                "mindmap": mindmap_check,
+                "combined": combined_check,
+                "direct": direct_check,
+                "stream": stream_check
+            }
+            job, attached = get_job_queue().submit(
+                job_key(doc_hash, options), run_analysis, uploaded_file, doc_hash, uploaded_file.name, options
+            )
+            st.session_state.job_id = job.id
+            st.session_state.job_notice = None
             st.session_state.summary = None
             st.session_state.key_points = None
             st.session_state.mindmap_data = None
-            
-            with st.spinner("📖 Extracting text..."):
-                try:
-                    text, page_count = extract_text_from_pdf(uploaded_file, ocr_check)
-                    
-                    if not text:
-                        st.error("❌ Could not extract text. Try enabling OCR.")
-                        st.stop()
-                    
-                    word_count = len(text.split())
-                    reading_time = max(1, round(word_count / 200))
-                    
-                    st.session_state.document_text = text
-                    st.session_state.metadata = {
-                        "filename": uploaded_file.name,
-                        "word_count": word_count,
-                        "page_count": page_count,
-                        "reading_time": reading_time,
-                        "audience": audience,
-                        "length": summary_length,
-                        "language": language
-                    }
-                    
-                    st.success(f"✅ Extracted {word_count:,} words from {page_count} pages")
-                except Exception as e:
-                    st.error(f"❌ Error: {str(e)}")
-                    st.stop()
-            
-            with st.spinner("🤖 Generating AI summary..."):
-                try:
-                    chunks = chunk_text(text)
-                    
-                    if len(chunks) > 1:
-                        partial_summaries = [summarize_text(chunk, audience, "short", "english") for chunk in chunks[:10]]
-                        combined = " ".join(partial_summaries)
-                        final_summary = summarize_text(combined, audience, summary_length, language)
-                    else:
-                        final_summary = summarize_text(text, audience, summary_length, language)
-                    
-                    if final_summary:
-                        st.session_state.summary = final_summary
-                    else:
-                        st.error("❌ Failed to generate summary")
-                        st.stop()
-                except Exception as e:
-                    st.error(f"❌ Error: {str(e)}")
-                    st.stop()
-            
-            if key_points_check:
-                with st.spinner("🔑 Extracting key points..."):
-                    try:
-                        key_points = extract_key_points(text)
-                        if key_points:
-                            st.session_state.key_points = key_points
-                    except Exception as e:
-                        st.warning(f"Could not extract key points: {str(e)}")
-            
-            if mindmap_check:
-                with st.spinner("🗺️ Generating mind map..."):
-                    try:
-                        mindmap = generate_mindmap_data(text)
-                        if mindmap:
-                            st.session_state.mindmap_data = mindmap
-                    except Exception as e:
-                        st.warning(f"Could not generate mind map: {str(e)}")
-            
-            st.balloons()
-            st.rerun()
+            if attached:
+                st.info("🔗 This document is already being analyzed with these options; following that run")
+    
+    if st.session_state.job_id:
+        show_job_progress()
+    
+    notice = st.session_state.job_notice
+    if notice:
+        for warning in notice.get("warnings", []):
+            st.warning(f"⚠️ {warning}")
+        if notice.get("error"):
+            st.error(f"❌ Error: {notice['error']}")
     
     st.markdown('</div>', unsafe_allow_html=True)
 
@@ -853,6 +731,69 @@ with col_results:
         with col5:
             st.metric("👤 Type", meta.get("audience", "General")[:3].upper())
         
+        stages = merge_summaries(meta.get("stages"), meta.get("chat_stages"))
+        if stages:
+            with st.expander("📊 Stage timings"):
+                st.dataframe([
+                    {
+                        "Stage": name,
+                        "Calls": values["calls"],
+                        "Wall (s)": round(values["wall"], 2),
+                        "Queue (s)": round(values["queue"], 2),
+                        "Prompt tokens": values["prompt_tokens"],
+                        "Completion tokens": values["completion_tokens"],
+                        "Cache hits": values["cache_hits"],
+                        "Fallbacks": values.get("fallbacks", 0),
+                        "Errors": values["errors"],
+                    }
+                    for name, values in stages.items()
+                ], hide_index=True, use_container_width=True)
+                st.caption("Times include nested stages (AI calls appear under their stage and under llm); chat rows add up over the conversation.")
+        
+        cache_stats = get_extraction_cache().stats()
+        st.caption(
+            f"🗄️ Extraction cache: {meta.get('extraction_cache', 'miss')} "
+            f"• {cache_stats['hits']} hits / {cache_stats['misses']} misses this server"
+        )
+        response_cache = get_response_cache()
+        if response_cache:
+            llm_stats = response_cache.stats()
+            st.caption(
+                f"🤖 AI response cache: {llm_stats['hit_ratio']:.0%} hit ratio "
+                f"• {llm_stats['saved_tokens']:,} tokens saved"
+            )
+        scheduler_stats = get_scheduler().stats()
+        if scheduler_stats["calls"]:
+            st.caption(
+                f"🚦 AI requests: {scheduler_stats['calls']} • waited {scheduler_stats['queue_p50']:.2f}s "
+                f"/ served {scheduler_stats['service_p50']:.2f}s (p50) • {scheduler_stats['retries']} retries "
+                f"• concurrency {scheduler_stats['concurrency_limit']}"
+            )
+        tree = meta.get("summary_tree")
+        if tree:
+            st.caption(
+                f"🌳 Summary tree: {tree['chunks']} sections • depth {tree['depth']} • {tree['calls']} AI calls"
+            )
+            extractive = tree.get("extractive")
+            if extractive and 0 < extractive["tokens_out"] < extractive["tokens_in"]:
+                st.caption(
+                    f"✂️ Key sentences sent to the AI: {extractive['tokens_out']:,} of {extractive['tokens_in']:,} "
+                    f"tokens ({extractive['tokens_in'] / extractive['tokens_out']:.1f}x smaller)"
+                )
+        store_stats = get_document_store().stats()
+        st.caption(
+            f"📚 Document store: {store_stats['documents']} documents • {store_stats['references']} in use "
+            f"• {store_stats['stored_bytes'] / 2**20:.1f} MB stored ({store_stats['ratio']:.1f}x {store_stats['codec']})"
+        )
+        if meta.get("index_chunks"):
+            st.caption(
+                f"🔎 Chat index: {meta['index_chunks']:,} passages built in {meta['index_seconds'] * 1000:.0f} ms"
+            )
+        if meta.get("reused"):
+            st.caption(f"♻️ Reused earlier results: {', '.join(meta['reused'])}")
+        if meta.get("summary_ttft") is not None:
+            st.caption(f"⚡ Summary first token after {meta['summary_ttft']:.2f}s")
+        
         st.divider()
         
         # Tabs
@@ -897,10 +838,11 @@ SUMMARY
                 )
             
             with col_btn2:
-                if st.session_state.document_text:
+                if st.session_state.document:
+                    # Decompressed only when clicked
                     st.download_button(
                         "📝 To Text",
-                        st.session_state.document_text,
+                        st.session_state.document.read,
                         file_name=f"{meta.get('filename', 'doc')}_extracted.txt",
                         mime="text/plain",
                         use_container_width=True
@@ -916,6 +858,7 @@ SUMMARY
                     st.session_state.key_points = None
                     st.session_state.mindmap_data = None
                     st.session_state.chat_history = []
+                    st.session_state.chat_memory = ConversationMemory()
                     st.rerun()
         
         with tab_keypoints:
@@ -946,29 +889,55 @@ SUMMARY
                     st.write(msg["question"])
                 with st.chat_message("assistant"):
                     st.write(msg["answer"])
+                    if msg.get("ttft") is not None:
+                        st.caption(f"⚡ First token after {msg['ttft']:.2f}s")
+            memory_stats = st.session_state.chat_memory.stats()
+            if memory_stats["folds"]:
+                st.caption(
+                    f"🧠 Earlier turns summarized • {memory_stats['turns']} recent turns kept "
+                    f"• ~{memory_stats['prompt_tokens']:,} tokens of conversation per question"
+                )
             
             # Chat input
-            if st.session_state.document_text:
+            if st.session_state.document:
                 question = st.chat_input("Ask a question about your document...")
                 
                 if question:
                     with st.chat_message("user"):
                         st.write(question)
                     
-                    with st.chat_message("assistant"):
-                        with st.spinner("Thinking..."):
-                            answer = chat_with_document(
-                                st.session_state.document_text,
+                    timing = {}
+                    document = st.session_state.document
+                    with st.chat_message("assistant"), trace("chat") as chat_trace:
+                        if stream_check:
+                            answer = st.write_stream(chat_with_document_stream(
+                                document.text,
                                 question,
-                                st.session_state.chat_history
-                            )
-                            st.write(answer)
+                                st.session_state.chat_memory,
+                                timing,
+                                document.index
+                            ))
+                        else:
+                            with st.spinner("Thinking..."):
+                                answer = chat_with_document(
+                                    document.text,
+                                    question,
+                                    st.session_state.chat_memory,
+                                    document.index
+                                )
+                                st.write(answer)
                     
-                    st.session_state.chat_history.append({
+                    # Folds older turns into the running summary in the background
+                    st.session_state.chat_memory.add(question, answer)
+                    append_turn(st.session_state.chat_history, {
                         "question": question,
                         "answer": answer,
-                        "timestamp": datetime.now().isoformat()
+                        "timestamp": datetime.now().isoformat(),
+                        "ttft": timing.get("ttft")
                     })
+                    st.session_state.metadata["chat_stages"] = merge_summaries(
+                        st.session_state.metadata.get("chat_stages"), chat_trace.summary()
+                    )
                     st.rerun()
             else:
                 st.info("Upload and analyze a PDF to start chatting!")
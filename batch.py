@@ -0,0 +1,210 @@
+"""Headless batch summarizer for directories or manifests of PDFs.
+
+    python batch.py ./inbox -o results.jsonl --workers 8 --map-concurrency 2
+
+Inputs are directories (searched recursively for *.pdf) or manifest files
+with one entry per line: either a path, or a JSON object with ``path`` and
+optional per-file ``language``/``audience``/``length``/``ocr`` overrides.
+Each finished file is appended to the output as one JSON line, with its
+per-stage timings, queue time, tokens and cache hits. Re-running with the
+same output skips files that already succeeded, so a crashed run resumes
+where it stopped.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Load environment (before imports: modules read their settings on import)
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+import summarizer  # noqa: E402
+from llm import get_scheduler  # noqa: E402
+from tracing import propagate, trace  # noqa: E402
+from summarizer import (  # noqa: E402
+    extract_key_points, extract_text_from_pdf, generate_mindmap_data, summarize_document
+)
+
+logger = logging.getLogger("batch")
+
+OPTION_KEYS = ("language", "audience", "length", "ocr", "key_points", "mindmap")
+
+
+def iter_inputs(inputs):
+    """Yield ``(path, overrides)`` for every PDF named by the inputs"""
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, files in os.walk(item):
+                for name in sorted(files):
+                    if name.lower().endswith(".pdf"):
+                        yield os.path.join(root, name), {}
+        elif item.lower().endswith(".pdf"):
+            yield item, {}
+        else:
+            base = os.path.dirname(os.path.abspath(item))
+            with open(item, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line or line.startswith("#"):
+                        continue
+                    if line.startswith("{"):
+                        entry = json.loads(line)
+                        path = entry.pop("path")
+                        overrides = {k: v for k, v in entry.items() if k in OPTION_KEYS}
+                    else:
+                        path, overrides = line, {}
+                    yield os.path.join(base, path), overrides
+
+
+def job_key(path, options):
+    return json.dumps([os.path.abspath(path), options], sort_keys=True)
+
+
+def load_completed(output_path):
+    """Keys of files that already succeeded in a previous run"""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # partial line from a crash
+            if record.get("status") == "ok":
+                done.add(job_key(record["path"], record["options"]))
+    return done
+
+
+def process_file(path, options):
+    """Run the app's pipeline on one PDF and return its result record"""
+    with trace("batch") as file_trace:
+        record = _run_pipeline(path, options)
+    record["stages"] = file_trace.summary()
+    return record
+
+
+def _run_pipeline(path, options):
+    timings = {}
+    started = time.perf_counter()
+
+    step = time.perf_counter()
+    with open(path, "rb") as f:
+        text, page_count, cache_hit = extract_text_from_pdf(f, options["ocr"])
+    timings["extract"] = time.perf_counter() - step
+    if not text:
+        raise ValueError("Could not extract text. Try enabling OCR.")
+
+    def timed(name, fn):
+        step = time.perf_counter()
+        try:
+            return fn(text, language=options["language"])
+        finally:
+            timings[name] = time.perf_counter() - step
+
+    # Key points and mind map only need the text: run them alongside the summary
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        timed_in_trace = propagate(timed)
+        key_points = pool.submit(timed_in_trace, "key_points", extract_key_points) if options["key_points"] else None
+        mindmap = pool.submit(timed_in_trace, "mindmap", generate_mindmap_data) if options["mindmap"] else None
+
+        step = time.perf_counter()
+        summary, tree = summarize_document(text, options["audience"], options["length"], options["language"])
+        timings["summary"] = time.perf_counter() - step
+        if not summary:
+            raise RuntimeError("Failed to generate summary")
+
+        key_points = key_points.result() if key_points else None
+        mindmap = mindmap.result() if mindmap else None
+
+    timings["total"] = time.perf_counter() - started
+    word_count = len(text.split())
+    return {
+        "summary": summary,
+        "key_points": key_points,
+        "mindmap": mindmap,
+        "metadata": {
+            "filename": os.path.basename(path),
+            "word_count": word_count,
+            "page_count": page_count,
+            "reading_time": max(1, round(word_count / 200)),
+            "extraction_cache": "hit" if cache_hit else "miss",
+            "summary_tree": tree,
+        },
+        "timings": timings,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("inputs", nargs="+", help="PDF files, directories or manifest files")
+    parser.add_argument("-o", "--output", required=True, help="JSONL file to append results to")
+    parser.add_argument("--workers", type=int, default=4, help="Files processed at once")
+    parser.add_argument("--map-concurrency", type=int, default=summarizer.MAP_CONCURRENCY,
+                        help="Concurrent AI calls per file during the map phase")
+    parser.add_argument("--language", default="english")
+    parser.add_argument("--audience", default="general",
+                        choices=["general", "ceo", "lawyer", "researcher", "student"])
+    parser.add_argument("--length", default="medium", choices=["short", "medium", "detailed"])
+    parser.add_argument("--ocr", action="store_true", help="OCR pages without embedded text")
+    parser.add_argument("--no-key-points", dest="key_points", action="store_false")
+    parser.add_argument("--no-mindmap", dest="mindmap", action="store_false")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    summarizer.MAP_CONCURRENCY = max(1, args.map_concurrency)
+
+    defaults = {k: getattr(args, k) for k in OPTION_KEYS}
+    done = load_completed(args.output)
+    jobs = []
+    for path, overrides in iter_inputs(args.inputs):
+        options = dict(defaults, **overrides)
+        if job_key(path, options) not in done:
+            jobs.append((path, options))
+    logger.info("%d files to process (%d already done)", len(jobs), len(done))
+
+    # A crash may have left a partial last line; start ours on a fresh one
+    if os.path.exists(args.output) and os.path.getsize(args.output):
+        with open(args.output, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            needs_newline = f.read(1) != b"\n"
+        if needs_newline:
+            with open(args.output, "a", encoding="utf-8") as f:
+                f.write("\n")
+
+    failures = 0
+    with open(args.output, "a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=args.workers) as pool:
+        futures = {pool.submit(process_file, path, options): (path, options) for path, options in jobs}
+        for n, future in enumerate(as_completed(futures), 1):
+            path, options = futures[future]
+            record = {"path": os.path.abspath(path), "options": options}
+            try:
+                record.update(status="ok", **future.result())
+                logger.info("[%d/%d] ok %s (%.1fs)", n, len(jobs), path, record["timings"]["total"])
+            except Exception as e:
+                failures += 1
+                record.update(status="error", error=str(e))
+                logger.warning("[%d/%d] failed %s: %s", n, len(jobs), path, e)
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            os.fsync(out.fileno())
+
+    stats = get_scheduler().stats()
+    logger.info(
+        "%d AI requests, %d retries (%d rate limited); queue p50 %.2fs p95 %.2fs, service p50 %.2fs p95 %.2fs",
+        stats["calls"], stats["retries"], stats["rate_limited"],
+        stats["queue_p50"], stats["queue_p95"], stats["service_p50"], stats["service_p95"],
+    )
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
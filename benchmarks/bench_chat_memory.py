@@ -0,0 +1,141 @@
+"""Chat memory benchmark: prompt size and latency per turn over a long conversation.
+
+    python benchmarks/bench_chat_memory.py --mock --turns 30 -o chat.json
+    python benchmarks/bench_chat_memory.py --pdf report.pdf --turns 20   # against the configured LLM
+
+Asks the same ``--turns`` questions about one document twice: with the
+previous prompt (6000 document characters plus the last five turns
+verbatim) and with chat.ConversationMemory (retrieved excerpts within
+CHAT_CONTEXT_TOKENS, running summary plus recent turns within
+CHAT_MEMORY_TOKENS, older turns folded in the background). Reports prompt
+tokens and latency per turn, and the tokens and calls the background folds
+cost. The response cache is off. With ``--mock`` answers are
+``--mock-answer-tokens`` long and time to first token grows with the
+prompt (``--mock-prefill-tokens-per-sec``).
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+from load_test import load_env, start_mock  # noqa: E402
+
+QUESTIONS = [
+    "What are the main findings?",
+    "Which risks does the document mention?",
+    "What are the payment terms?",
+    "Who are the parties involved?",
+    "What does the document say about liability?",
+    "Summarize the methodology.",
+    "Which figures stand out?",
+    "What should a manager do next?",
+]
+
+
+def legacy_messages(text, question, history):
+    """The chat prompt before ConversationMemory"""
+    messages = [{"role": "system",
+                 "content": f"You are an AI assistant. Answer based on these excerpts of the document:\n\n{text[:6000]}"}]
+    for turn in history[-5:]:
+        messages.append({"role": "user", "content": turn["question"]})
+        messages.append({"role": "assistant", "content": turn["answer"]})
+    messages.append({"role": "user", "content": question})
+    return messages
+
+
+def run_conversation(mode, text, args):
+    from chat import ConversationMemory, chat_with_document
+    from llm import create_completion
+    from retrieval import build_index
+    from tracing import trace
+
+    index = build_index(text)
+    memory = ConversationMemory()
+    history = []
+    turns = []
+    with trace(mode) as run_trace:
+        for n in range(args.turns):
+            question = QUESTIONS[n % len(QUESTIONS)]
+            with trace("turn") as turn_trace:
+                started = time.perf_counter()
+                if mode == "legacy":
+                    answer = create_completion(legacy_messages(text, question, history), stage="chat")
+                else:
+                    answer = chat_with_document(text, question, memory, index)
+                seconds = time.perf_counter() - started
+            llm_stats = turn_trace.summary().get("llm", {})
+            turns.append({"seconds": seconds, "prompt_tokens": llm_stats.get("prompt_tokens", 0)})
+            history.append({"question": question, "answer": answer})
+            if mode == "memory":
+                memory.add(question, answer)
+                if args.wait_folds:
+                    memory.wait()
+        memory.wait()
+    folds = run_trace.summary().get("chat_memory", {})
+    return {
+        "turns": turns,
+        "fold_calls": folds.get("calls", 0),
+        "fold_seconds": folds.get("wall", 0.0),
+        "memory": memory.stats() if mode == "memory" else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pdf", help="Document to chat about (default: a synthetic text PDF)")
+    parser.add_argument("--pages", type=int, default=20, help="Pages of the synthetic document")
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--wait-folds", action="store_true",
+                        help="Let each fold finish before the next question (as with a human typing)")
+    parser.add_argument("--mock", action="store_true", help="Start benchmarks/mock_llm.py and use it")
+    parser.add_argument("--mock-latency", type=float, default=0.2)
+    parser.add_argument("--mock-tokens-per-sec", type=float, default=1000)
+    parser.add_argument("--mock-answer-tokens", type=int, default=600)
+    parser.add_argument("--mock-prefill-tokens-per-sec", type=float, default=5000)
+    parser.add_argument("-o", "--output", help="Write results as JSON")
+    args = parser.parse_args()
+
+    load_env(LLM_CACHE="0")
+    mock_args = ("--completion-tokens", args.mock_answer_tokens,
+                 "--prefill-tokens-per-sec", args.mock_prefill_tokens_per_sec)
+    mock = start_mock(args, mock_args, extra_env={"LLM_RPM": "0", "LLM_TPM": "0"}) if args.mock else None
+
+    try:
+        from bench_extraction import load_text
+
+        text = load_text(args.pdf, args.pages)
+        results = {mode: run_conversation(mode, text, args) for mode in ("legacy", "memory")}
+    finally:
+        if mock:
+            mock.terminate()
+
+    print(f"{len(text):,} characters, {args.turns} turns\n")
+    print(f"{'turn':>4} {'legacy tok':>11} {'memory tok':>11} {'legacy':>8} {'memory':>8}")
+    for n in range(args.turns):
+        old, new = results["legacy"]["turns"][n], results["memory"]["turns"][n]
+        print(f"{n + 1:>4} {old['prompt_tokens']:>11} {new['prompt_tokens']:>11} "
+              f"{old['seconds']:>7.2f}s {new['seconds']:>7.2f}s")
+    for mode in ("legacy", "memory"):
+        turns = results[mode]["turns"]
+        tokens = [t["prompt_tokens"] for t in turns]
+        seconds = [t["seconds"] for t in turns]
+        print(f"{mode:<7} prompt tokens max {max(tokens):,} mean {statistics.mean(tokens):,.0f} • "
+              f"latency p50 {statistics.median(seconds):.2f}s max {max(seconds):.2f}s")
+    memory = results["memory"]
+    print(f"background folds: {memory['fold_calls']} calls, {memory['fold_seconds']:.2f}s • {memory['memory']}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+        print(f"Saved to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,68 @@
+"""Microbenchmark for the chunker on multi-MB inputs.
+
+    python benchmarks/bench_chunking.py --sizes 1 2 4 8
+
+Runs chunking.chunk_document over synthetic text shaped like PyPDF2 output
+(single newlines, no blank lines) plus a whitespace-free worst case, and
+prints throughput per size. Linear behaviour shows up as flat MB/s.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chunking import chunk_document  # noqa: E402
+
+WORDS = (
+    "the contract party shall agreement payment term liability clause notice "
+    "section report results method analysis data revenue risk market growth"
+).split()
+
+
+def pdf_like_text(size_bytes, seed=0):
+    """Sentences wrapped at ~90 columns with single newlines, like PyPDF2 output"""
+    rng = random.Random(seed)
+    lines = []
+    total = 0
+    while total < size_bytes:
+        line = " ".join(rng.choice(WORDS) for _ in range(14))
+        line = line.capitalize() + ("." if rng.random() < 0.4 else "")
+        lines.append(line)
+        total += len(line) + 1
+    return "\n".join(lines)
+
+
+def unbroken_text(size_bytes):
+    """No separators at all: forces hard splits"""
+    return "x" * size_bytes
+
+
+def bench(text, repeat):
+    best = float("inf")
+    chunks = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        chunks = chunk_document(text)
+        best = min(best, time.perf_counter() - start)
+    return best, len(chunks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=float, nargs="+", default=[1, 2, 4, 8], help="Input sizes in MB")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'input':<10} {'MB':>6} {'chunks':>8} {'seconds':>9} {'MB/s':>8}")
+    for name, make in (("pdf-like", pdf_like_text), ("unbroken", unbroken_text)):
+        for size_mb in args.sizes:
+            text = make(int(size_mb * 1024 * 1024))
+            seconds, n_chunks = bench(text, args.repeat)
+            print(f"{name:<10} {size_mb:>6g} {n_chunks:>8} {seconds:>9.3f} {size_mb / seconds:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""Extraction and chunking benchmark over a synthetic PDF corpus.
+
+    python benchmarks/bench_extraction.py --pages 1 10 100 2000 -o run.json
+    python benchmarks/bench_extraction.py --compare baseline.json run.json
+
+Generates text-only, scanned-image and mixed PDFs offline (plain PDF syntax,
+no extra dependencies; scanned pages are drawn with PIL when it is
+installed), caches them under .cache/bench_corpus, and runs every
+extraction backend and chunker on each document in a fresh interpreter so
+peak RSS is per case. Reports pages/s, MB/s, peak RSS and per-stage wall
+time, and writes everything to JSON for comparing runs.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import time
+import zlib
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_chunking import WORDS  # noqa: E402
+
+KINDS = ("text", "scanned", "mixed")
+BACKENDS = ("pypdf2", "pypdf2-parallel", "pdfplumber", "ocr")
+CORPUS_DIR = os.path.join(ROOT, ".cache", "bench_corpus")
+LINES_PER_PAGE = 45
+SCAN_WIDTH, SCAN_HEIGHT = 850, 1100  # US Letter at 100 dpi
+
+
+def page_lines(rng):
+    return [" ".join(rng.choice(WORDS) for _ in range(12)).capitalize() + "." for _ in range(LINES_PER_PAGE)]
+
+
+def scan_image(lines):
+    """Grayscale raster of a page of text (ruled lines if PIL is missing)"""
+    try:
+        from PIL import Image, ImageDraw
+    except ImportError:
+        row = bytes([255] * SCAN_WIDTH)
+        ink = bytes([255] * 60 + [40] * (SCAN_WIDTH - 120) + [255] * 60)
+        return b"".join(ink if 80 <= y < 1020 and y % 22 < 3 else row for y in range(SCAN_HEIGHT))
+    image = Image.new("L", (SCAN_WIDTH, SCAN_HEIGHT), 255)
+    draw = ImageDraw.Draw(image)
+    for i, line in enumerate(lines):
+        draw.text((60, 60 + i * 22), line, fill=0)
+    return image.tobytes()
+
+
+def write_pdf(path, kind, pages, seed=0):
+    """Minimal PDF: Helvetica text pages, Flate-compressed image pages, or both.
+
+    ``kind`` is one of KINDS, or "bulk" (mixed, with noise images) for size tests.
+    """
+    rng = random.Random(seed)
+    objects = []
+
+    def add(body):
+        objects.append(body)
+        return len(objects)
+
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    pages_id = add(None)  # filled in once the page ids are known
+    kids = []
+    for n in range(pages):
+        lines = page_lines(rng)
+        scanned = kind == "scanned" or (kind in ("mixed", "bulk") and n % 3 == 2)
+        if scanned:
+            # "bulk" pages are incompressible noise, to build very large files quickly
+            raster = rng.randbytes(SCAN_WIDTH * SCAN_HEIGHT) if kind == "bulk" else scan_image(lines)
+            data = zlib.compress(raster, 1 if kind == "bulk" else 6)
+            image = add(
+                b"<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /DeviceGray "
+                b"/BitsPerComponent 8 /Filter /FlateDecode /Length %d >>\nstream\n%s\nendstream"
+                % (SCAN_WIDTH, SCAN_HEIGHT, len(data), data)
+            )
+            ops = b"q 612 0 0 792 0 0 cm /Im0 Do Q"
+            resources = b"<< /XObject << /Im0 %d 0 R >> >>" % image
+        else:
+            text = b" ".join(b"(%s) Tj T*" % line.encode("latin-1") for line in lines)
+            ops = b"BT /F1 10 Tf 12 TL 50 750 Td " + text + b" ET"
+            resources = b"<< /Font << /F1 %d 0 R >> >>" % font
+        content = add(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(ops), ops))
+        kids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 792] /Resources %s /Contents %d 0 R >>"
+            % (pages_id, resources, content)
+        ))
+    objects[pages_id - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % k for k in kids), pages
+    )
+    catalog = add(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = []
+        for i, body in enumerate(objects, 1):
+            offsets.append(f.tell())
+            f.write(b"%d 0 obj\n%s\nendobj\n" % (i, body))
+        xref = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        f.write(b"".join(b"%010d 00000 n \n" % offset for offset in offsets))
+        f.write(b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog, xref))
+    os.replace(tmp, path)
+
+
+def corpus_file(kind, pages):
+    os.makedirs(CORPUS_DIR, exist_ok=True)
+    path = os.path.join(CORPUS_DIR, f"{kind}-{pages}.pdf")
+    if not os.path.exists(path):
+        write_pdf(path, kind, pages)
+    return path
+
+
+def load_text(pdf=None, pages=20):
+    """Extracted text of ``pdf``, or of the synthetic text PDF of ``pages`` pages"""
+    from summarizer import extract_text_from_pdf
+
+    with open(pdf or corpus_file("text", pages), "rb") as f:
+        text, _, _ = extract_text_from_pdf(f)
+    return text
+
+
+def ocr_ready():
+    from extraction import OCR_AVAILABLE
+    return OCR_AVAILABLE and shutil.which("tesseract") and shutil.which("pdftoppm")
+
+
+def run_case(path, backend):
+    """Runs in a child interpreter: extract with one backend, then chunk"""
+    from chunking import chunk_document, iter_page_chunks
+    from extraction import SpooledPDF, iter_pages, iter_pages_ocr
+    from summarizer import _fallback_pages
+
+    stages = {}
+    start = time.perf_counter()
+    with open(path, "rb") as f, SpooledPDF(f) as pdf:
+        stages["spool"] = time.perf_counter() - start
+        start = time.perf_counter()
+        if backend == "pypdf2":
+            pages = list(iter_pages(pdf, workers=1))
+        elif backend == "pypdf2-parallel":
+            pages = list(iter_pages(pdf, min_pages=1))
+        elif backend == "pdfplumber":
+            pages = _fallback_pages(pdf)
+        else:
+            pages = list(iter_pages_ocr(pdf))
+    stages["extract"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    text = "\n".join(pages)
+    chunks = chunk_document(text)
+    stages["chunk_document"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    page_chunks = sum(1 for _ in iter_page_chunks(pages))
+    stages["iter_page_chunks"] = time.perf_counter() - start
+
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return {
+        "stages": stages,
+        "pages_extracted": len(pages),
+        "chars": len(text),
+        "chunks": len(chunks),
+        "page_chunks": page_chunks,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2**20,
+        "peak_rss_workers_mb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale / 2**20,
+    }
+
+
+def measure(kind, pages, backend):
+    path = corpus_file(kind, pages)
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--case", path, backend],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        return {"kind": kind, "pages": pages, "backend": backend, "error": result.stderr.strip().splitlines()[-1:]}
+    record = json.loads(result.stdout.strip().splitlines()[-1])
+    file_mb = os.path.getsize(path) / 2**20
+    extract = record["stages"]["extract"]
+    record.update(
+        kind=kind,
+        pages=pages,
+        backend=backend,
+        file_mb=file_mb,
+        pages_per_sec=pages / extract if extract else None,
+        mb_per_sec=file_mb / extract if extract else None,
+    )
+    return record
+
+
+def case_id(record):
+    return (record["kind"], record["pages"], record["backend"])
+
+
+def compare(old_path, new_path):
+    with open(old_path) as f:
+        old = {case_id(r): r for r in json.load(f)["results"] if "error" not in r}
+    with open(new_path) as f:
+        new = [r for r in json.load(f)["results"] if "error" not in r]
+    print(f"{'kind':<8} {'pages':>6} {'backend':<16} {'pages/s old':>12} {'new':>10} {'change':>8}")
+    for record in new:
+        before = old.get(case_id(record))
+        if not before or not before["pages_per_sec"]:
+            continue
+        change = record["pages_per_sec"] / before["pages_per_sec"] - 1
+        print(
+            f"{record['kind']:<8} {record['pages']:>6} {record['backend']:<16} "
+            f"{before['pages_per_sec']:>12.1f} {record['pages_per_sec']:>10.1f} {change:>+8.0%}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 10, 100, 500, 2000])
+    parser.add_argument("--kinds", nargs="+", choices=KINDS, default=list(KINDS))
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument("--ocr-max-pages", type=int, default=20,
+                        help="Skip OCR on larger documents (tesseract runs at ~1 page/s per core)")
+    parser.add_argument("-o", "--output", help="Write results as JSON")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="Compare two result files")
+    parser.add_argument("--case", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        print(json.dumps(run_case(*args.case)))
+        return 0
+    if args.compare:
+        compare(*args.compare)
+        return 0
+
+    has_ocr = ocr_ready()
+    results = []
+    print(f"{'kind':<8} {'pages':>6} {'backend':<16} {'pages/s':>9} {'MB/s':>7} {'extract':>8} "
+          f"{'chunk':>7} {'RSS MB':>7}")
+    for kind in args.kinds:
+        for pages in args.pages:
+            for backend in args.backends:
+                if backend == "ocr" and (not has_ocr or pages > args.ocr_max_pages):
+                    continue
+                record = measure(kind, pages, backend)
+                results.append(record)
+                if "error" in record:
+                    print(f"{kind:<8} {pages:>6} {backend:<16} failed: {' '.join(record['error'])}")
+                    continue
+                stages = record["stages"]
+                print(
+                    f"{kind:<8} {pages:>6} {backend:<16} {record['pages_per_sec']:>9.1f} "
+                    f"{record['mb_per_sec']:>7.2f} {stages['extract']:>7.2f}s {stages['chunk_document']:>6.3f}s "
+                    f"{max(record['peak_rss_mb'], record['peak_rss_workers_mb']):>7.0f}"
+                )
+    if not has_ocr and "ocr" in args.backends:
+        print("OCR skipped: pytesseract/pdf2image or the tesseract/poppler binaries are missing")
+
+    if args.output:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True)
+        report = {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": commit.stdout.strip() or None,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "results": results,
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved {len(results)} results to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+"""Extractive pre-summarization benchmark: map-phase calls, tokens and time per compression ratio.
+
+    python benchmarks/bench_extractive.py --mock --pages 100 -o extractive.json
+    python benchmarks/bench_extractive.py --pdf report.pdf --ratios 1 0.5 0.35   # against the configured LLM
+
+Runs map, reduce and the final summary of one document once per
+``--ratios`` value (1 = chunks sent whole, as before extractive.py). Reports
+the local condensing time, map chunks, LLM calls, prompt and completion
+tokens and wall time, the preview_summary time, and the unigram F1
+(ROUGE-1) of each final summary against the ratio-1 one. The response cache
+is off. With ``--mock`` every answer is alike, so only calls, tokens and
+time are meaningful; the mock's time to first token grows with the prompt
+(``--mock-prefill-tokens-per-sec``).
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+from load_test import load_env, start_mock  # noqa: E402
+
+
+def run_ratio(ratio, text, args):
+    import extractive
+    from summarizer import reduce_document, summarize_text
+    from tracing import trace
+
+    extractive.EXTRACTIVE_RATIO = ratio
+    with trace(f"ratio-{ratio}") as run_trace:
+        started = time.perf_counter()
+        summary_input, tree = reduce_document(text, args.audience)
+        summary = summarize_text(summary_input, args.audience, args.length) if summary_input else None
+        seconds = time.perf_counter() - started
+    stages = run_trace.summary()
+    llm_stats = stages.get("llm", {})
+    return {
+        "ratio": ratio,
+        "summary": summary,
+        "seconds": seconds,
+        "map_seconds": stages.get("map", {}).get("wall", 0.0),
+        "extractive_seconds": stages.get("extractive", {}).get("wall", 0.0),
+        "map_chunks": tree["chunks"],
+        "llm_calls": llm_stats.get("calls", 0),
+        "prompt_tokens": llm_stats.get("prompt_tokens", 0),
+        "completion_tokens": llm_stats.get("completion_tokens", 0),
+        "extractive": tree.get("extractive"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pdf", help="Document to run (default: a synthetic text PDF)")
+    parser.add_argument("--pages", type=int, default=100, help="Pages of the synthetic document")
+    parser.add_argument("--ratios", type=float, nargs="+", default=[1, 0.5, 0.35, 0.2])
+    parser.add_argument("--audience", default="general")
+    parser.add_argument("--length", default="medium")
+    parser.add_argument("--mock", action="store_true", help="Start benchmarks/mock_llm.py and use it")
+    parser.add_argument("--mock-latency", type=float, default=0.3)
+    parser.add_argument("--mock-tokens-per-sec", type=float, default=200)
+    parser.add_argument("--mock-prefill-tokens-per-sec", type=float, default=2000)
+    parser.add_argument("-o", "--output", help="Write results as JSON")
+    args = parser.parse_args()
+
+    load_env(LLM_CACHE="0")
+    mock_args = ("--prefill-tokens-per-sec", args.mock_prefill_tokens_per_sec)
+    mock = start_mock(args, mock_args, extra_env={"LLM_RPM": "0", "LLM_TPM": "0"}) if args.mock else None
+
+    try:
+        from bench_extraction import load_text
+        from bench_routing import rouge1_f1
+        from extractive import preview_summary
+
+        text = load_text(args.pdf, args.pages)
+        started = time.perf_counter()
+        preview_summary(text)
+        preview_seconds = time.perf_counter() - started
+        results = [run_ratio(ratio, text, args) for ratio in args.ratios]
+    finally:
+        if mock:
+            mock.terminate()
+
+    reference = next((r["summary"] for r in results if r["ratio"] >= 1), results[0]["summary"])
+    print(f"{len(text):,} characters • preview_summary {preview_seconds * 1000:.0f} ms\n")
+    print(f"{'ratio':>5} {'condense':>9} {'chunks':>6} {'calls':>6} {'prompt tok':>11} {'compl tok':>10} "
+          f"{'map':>7} {'total':>7} {'ROUGE-1':>8}")
+    for r in results:
+        r["rouge1_f1"] = rouge1_f1(r["summary"], reference)
+        print(
+            f"{r['ratio']:>5g} {r['extractive_seconds']:>8.3f}s {r['map_chunks']:>6} {r['llm_calls']:>6} "
+            f"{r['prompt_tokens']:>11,} {r['completion_tokens']:>10,} {r['map_seconds']:>6.2f}s "
+            f"{r['seconds']:>6.2f}s {r['rouge1_f1']:>8.2f}"
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "preview_seconds": preview_seconds, "results": results}, f, indent=2)
+        print(f"Saved to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
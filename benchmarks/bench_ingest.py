@@ -0,0 +1,172 @@
+"""Peak memory of ingesting a large upload (200 MB by default).
+
+    python benchmarks/bench_ingest.py --size-mb 200
+
+Builds a mixed text/image PDF of about ``--size-mb`` (cached under
+.cache/bench_corpus), then in a fresh interpreter per mode holds it in a
+BytesIO as Streamlit's uploader does and extracts every page:
+
+- bytes: the old path, ``read()`` into bytes and parse a BytesIO copy
+- spooled: extract_text_from_pdf (temp file + memory map), one process
+- spooled-parallel: the same with the default process pool
+
+Reports peak RSS of the process and of its workers, the increase over the
+RSS measured once the app's modules are imported and the upload is in
+memory (so no mode is charged for import cost), and (on Linux) the sampled
+peak of anonymous memory. RSS also counts the clean, reclaimable file pages
+of a memory mapping; anonymous memory is what the process really pins.
+"""
+import argparse
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_extraction import CORPUS_DIR, write_pdf  # noqa: E402
+
+MODES = ("bytes", "spooled", "spooled-parallel")
+# Average size of a "bulk" page: two text pages and one ~0.9 MB noise image per three
+BULK_MB_PER_PAGE = 0.30
+
+
+def rss_mb(who=resource.RUSAGE_SELF):
+    scale = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(who).ru_maxrss * scale / 2**20
+
+
+def current_rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        return rss_mb()
+
+
+def anon_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("RssAnon:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def sample_peak_anon(peak, stop, interval=0.005):
+    while not stop.is_set():
+        value = anon_mb()
+        if value is None:
+            return
+        peak[0] = max(peak[0], value)
+        stop.wait(interval)
+
+
+def corpus_file(size_mb):
+    os.makedirs(CORPUS_DIR, exist_ok=True)
+    pages = max(3, round(size_mb / BULK_MB_PER_PAGE))
+    path = os.path.join(CORPUS_DIR, f"bulk-{pages}.pdf")
+    if not os.path.exists(path):
+        write_pdf(path, "bulk", pages)
+    return path
+
+
+def run_mode(path, mode):
+    """Runs in a child interpreter"""
+    # Same imports in every mode before the baseline: summarizer alone pulls
+    # in numpy, groq and httpx, tens of MB that are not ingest cost
+    import hashlib
+    import PyPDF2
+    from summarizer import extract_text_from_pdf
+
+    with open(path, "rb") as f:
+        upload = io.BytesIO(f.read())
+    baseline = current_rss_mb()
+    baseline_anon = anon_mb()
+    peak_anon = [0.0]
+    stop = threading.Event()
+    sampler = threading.Thread(target=sample_peak_anon, args=(peak_anon, stop), daemon=True)
+    sampler.start()
+
+    start = time.perf_counter()
+    if mode == "bytes":
+        pdf_bytes = upload.read()
+        hashlib.sha256(pdf_bytes).hexdigest()
+        reader = PyPDF2.PdfReader(io.BytesIO(pdf_bytes))
+        pages = [page.extract_text() or "" for page in reader.pages]
+        page_count = len(pages)
+    else:
+        _, page_count, _ = extract_text_from_pdf(upload)
+    seconds = time.perf_counter() - start
+    stop.set()
+    sampler.join()
+
+    return {
+        "mode": mode,
+        "pages": page_count,
+        "seconds": seconds,
+        "baseline_rss_mb": baseline,
+        "peak_rss_mb": rss_mb(),
+        "peak_rss_workers_mb": rss_mb(resource.RUSAGE_CHILDREN),
+        "increase_mb": rss_mb() - baseline,
+        "peak_anon_increase_mb": peak_anon[0] - baseline_anon if baseline_anon is not None else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=float, default=200)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("-o", "--output", help="Write results as JSON")
+    parser.add_argument("--mode", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(*args.mode)))
+        return 0
+
+    path = corpus_file(args.size_mb)
+    file_mb = os.path.getsize(path) / 2**20
+    print(f"{os.path.basename(path)}: {file_mb:.0f} MB")
+    print(f"{'mode':<18} {'pages':>6} {'seconds':>8} {'base MB':>10} {'peak MB':>8} {'+MB':>6} "
+          f"{'+anon MB':>9} {'workers MB':>11}")
+
+    results = []
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for mode in args.modes:
+            # Fresh cache per run so nothing is served from a previous mode
+            env = dict(os.environ, EXTRACTION_CACHE_DIR=os.path.join(cache_dir, mode))
+            if mode == "spooled":
+                env["PDF_EXTRACT_WORKERS"] = "1"
+            result = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--mode", path, mode],
+                cwd=ROOT, capture_output=True, text=True, env=env,
+            )
+            if result.returncode != 0:
+                print(f"{mode:<18} failed: {result.stderr.strip().splitlines()[-1:]}")
+                continue
+            record = json.loads(result.stdout.strip().splitlines()[-1])
+            record["file_mb"] = file_mb
+            results.append(record)
+            print(
+                f"{mode:<18} {record['pages']:>6} {record['seconds']:>8.1f} {record['baseline_rss_mb']:>10.0f} "
+                f"{record['peak_rss_mb']:>8.0f} {record['increase_mb']:>6.0f} "
+                f"{record['peak_anon_increase_mb'] or 0:>9.0f} {record['peak_rss_workers_mb']:>11.0f}"
+            )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"file": path, "file_mb": file_mb, "results": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
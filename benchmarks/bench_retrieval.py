@@ -0,0 +1,55 @@
+"""Build time and query latency of the chat retrieval index.
+
+    python benchmarks/bench_retrieval.py --pages 1000 2000
+
+Indexes synthetic PyPDF2-like text (~3,000 characters per page) with
+retrieval.build_index and times a batch of keyword queries against it.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_chunking import WORDS, pdf_like_text  # noqa: E402
+from retrieval import build_index  # noqa: E402
+
+PAGE_CHARS = 3000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[1000, 2000])
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    queries = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 10))) for _ in range(args.queries)]
+
+    print(f"{'pages':>6} {'MB':>6} {'passages':>9} {'build s':>8} {'query p50 ms':>13} {'query p95 ms':>13}")
+    for pages in args.pages:
+        text = pdf_like_text(pages * PAGE_CHARS, seed=pages)
+
+        start = time.perf_counter()
+        index = build_index(text)
+        build_seconds = time.perf_counter() - start
+
+        latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            index.search(query)
+            latencies.append((time.perf_counter() - start) * 1000)
+        latencies.sort()
+        p50 = latencies[len(latencies) // 2]
+        p95 = latencies[int(len(latencies) * 0.95) - 1]
+
+        print(
+            f"{pages:>6} {len(text) / 1e6:>6.1f} {len(index.chunks):>9,} "
+            f"{build_seconds:>8.2f} {p50:>13.2f} {p95:>13.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
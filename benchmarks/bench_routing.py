@@ -0,0 +1,208 @@
+"""Model routing benchmark: per-stage latency and quality, one model vs the routing table.
+
+    python benchmarks/bench_routing.py --mock -o routing.json
+    python benchmarks/bench_routing.py --pdf report.pdf --judge   # against the configured LLM
+
+Runs every LLM stage of the pipeline (map, reduce, summary, translate, key
+points, mind map, chat) on one document twice: once with every stage on
+LLM_MODEL, as before routing, and once with llm.ROUTES (including any
+LLM_ROUTES overrides). Only the model differs between the two; max_tokens
+and temperature come from the table in both. Stages after the map get the
+single-model run's output as input in both runs, so each stage is compared
+on its own. Reports each stage's model, wall time, tokens and fallbacks,
+plus quality as unigram F1 (ROUGE-1) of the routed output against the
+single-model one. ``--judge`` also has LLM_MODEL score every routed output
+from 1 to 10 against it. The response cache is off, so every call hits the
+API. With ``--mock`` the fast model is simply made ``--mock-fast-speed``
+times faster and every answer is the same, so only latency is meaningful.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import time
+from collections import Counter
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+from load_test import load_env, start_mock  # noqa: E402
+
+STAGES = ("map", "reduce", "summary", "translate", "key_points", "mindmap", "chat")
+QUESTIONS = [
+    "What are the main findings?",
+    "Which risks does the document mention?",
+    "What are the payment terms?",
+]
+FAST_MODEL = "llama-3.1-8b-instant"
+
+
+def rouge1_f1(candidate, reference):
+    from retrieval import tokenize
+
+    cand, ref = Counter(tokenize(candidate or "")), Counter(tokenize(reference or ""))
+    overlap = sum((cand & ref).values())
+    if not overlap:
+        return 0.0
+    precision, recall = overlap / sum(cand.values()), overlap / sum(ref.values())
+    return 2 * precision * recall / (precision + recall)
+
+
+def judge(stage, candidate, reference):
+    """1-10 score of ``candidate`` against ``reference`` (single-model routes must be active)"""
+    from llm import create_completion
+
+    prompt = (
+        f"Two outputs of the '{stage}' step of a document summarizer. The reference comes from a large model.\n\n"
+        f"REFERENCE:\n{reference[:6000]}\n\nCANDIDATE:\n{candidate[:6000]}\n\n"
+        "Rate the candidate's quality (faithfulness, completeness, fluency) against the reference "
+        "from 1 (unusable) to 10 (as good or better). Reply with the number only."
+    )
+    try:
+        reply = create_completion([{"role": "user", "content": prompt}], temperature=0, max_tokens=5)
+    except Exception:
+        return None
+    match = re.search(r"\d+", reply or "")
+    return min(10, int(match.group())) if match else None
+
+
+def run_stages(inputs, args):
+    """Run each stage once; returns ``{stage: (output, seconds, llm_summary)}``"""
+    from chat import chat_with_document
+    from retrieval import build_index
+    from summarizer import (
+        extract_key_points, generate_mindmap_data, reduce_summaries, summarize_chunks, summarize_text,
+        translate_text
+    )
+    from tracing import trace
+
+    text = inputs["text"]
+    index = build_index(text)
+    # Force at least one reduce level, whatever the document size
+    max_chars = max(1, sum(len(s) for s in inputs["partials"]) // 2)
+    calls = {
+        "map": lambda: "\n".join(s or "" for s in summarize_chunks(inputs["chunks"], args.audience)),
+        "reduce": lambda: reduce_summaries(inputs["partials"], args.audience, max_chars=max_chars),
+        "summary": lambda: summarize_text(inputs["reduced"], args.audience, args.length, "english"),
+        "translate": lambda: translate_text(inputs["summary"], args.language),
+        "key_points": lambda: extract_key_points(text),
+        "mindmap": lambda: json.dumps(generate_mindmap_data(text)),
+        "chat": lambda: "\n\n".join(chat_with_document(text, q, [], index) for q in QUESTIONS[:args.questions]),
+    }
+    results = {}
+    for stage in STAGES:
+        with trace(stage) as stage_trace:
+            started = time.perf_counter()
+            output = calls[stage]()
+            seconds = time.perf_counter() - started
+        results[stage] = (output, seconds, stage_trace.summary().get("llm", {}))
+    return results
+
+
+def run_config(routes, inputs, args):
+    import llm
+
+    llm.ROUTES.clear()
+    llm.ROUTES.update(routes)
+    runs = [run_stages(inputs, args) for _ in range(args.repeats)]
+    report = {}
+    for stage in STAGES:
+        llm_stats = [run[stage][2] for run in runs]
+        report[stage] = {
+            "model": routes.get(stage, routes["default"]).model,
+            "output": runs[0][stage][0],
+            "seconds": statistics.median(run[stage][1] for run in runs),
+            "llm_calls": llm_stats[0].get("calls", 0),
+            "prompt_tokens": llm_stats[0].get("prompt_tokens", 0),
+            "completion_tokens": llm_stats[0].get("completion_tokens", 0),
+            "fallbacks": sum(s.get("fallbacks", 0) for s in llm_stats),
+            "errors": sum(s.get("errors", 0) for s in llm_stats),
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pdf", help="Document to run (default: a synthetic text PDF)")
+    parser.add_argument("--pages", type=int, default=20, help="Pages of the synthetic document")
+    parser.add_argument("--audience", default="general")
+    parser.add_argument("--length", default="medium")
+    parser.add_argument("--language", default="spanish", help="Target of the translate stage")
+    parser.add_argument("--questions", type=int, default=3, help="Chat questions")
+    parser.add_argument("--repeats", type=int, default=1, help="Runs per configuration (median time)")
+    parser.add_argument("--judge", action="store_true", help="Score routed outputs with LLM_MODEL")
+    parser.add_argument("--mock", action="store_true", help="Start benchmarks/mock_llm.py and use it")
+    parser.add_argument("--mock-latency", type=float, default=0.3)
+    parser.add_argument("--mock-tokens-per-sec", type=float, default=200)
+    parser.add_argument("--mock-fast-speed", type=float, default=4, help="How much faster the fast model is")
+    parser.add_argument("--mock-fail-model", action="append", default=[], help="Model the mock fails (503)")
+    parser.add_argument("-o", "--output", help="Write results as JSON")
+    args = parser.parse_args()
+
+    load_env(LLM_CACHE="0")
+    mock_args = ["--model-speed", f"{FAST_MODEL}={args.mock_fast_speed}"]
+    mock_args += [arg for model in args.mock_fail_model for arg in ("--fail-model", model)]
+    mock_env = {"LLM_FAST_MODEL": FAST_MODEL, "LLM_RPM": "0", "LLM_TPM": "0"}
+    mock = start_mock(args, mock_args, mock_env) if args.mock else None
+
+    try:
+        import llm
+        from bench_extraction import load_text
+        from summarizer import chunk_text, reduce_summaries, summarize_chunks, summarize_text
+
+        routed = dict(llm.ROUTES)
+        single = {stage: route._replace(model=llm.LLM_MODEL, fallback=None) for stage, route in routed.items()}
+
+        # Reference inputs for every stage, from the single-model configuration
+        text = load_text(args.pdf, args.pages)
+        llm.ROUTES.update(single)
+        chunks = chunk_text(text)
+        partials = summarize_chunks(chunks, args.audience)
+        reduced = reduce_summaries(partials, args.audience)
+        inputs = {
+            "text": text,
+            "chunks": chunks,
+            "partials": partials,
+            "reduced": reduced,
+            "summary": summarize_text(reduced, args.audience, args.length, "english"),
+        }
+
+        results = {"single": run_config(single, inputs, args), "routed": run_config(routed, inputs, args)}
+        llm.ROUTES.clear()
+        llm.ROUTES.update(single)
+        for stage in STAGES:
+            new, old = results["routed"][stage], results["single"][stage]
+            new["rouge1_f1"] = rouge1_f1(new["output"], old["output"])
+            new["judge"] = judge(stage, new["output"], old["output"]) if args.judge else None
+    finally:
+        if mock:
+            mock.terminate()
+
+    print(f"{len(text):,} characters, {len(chunks)} chunks\n")
+    print(f"{'stage':<11} {'single model':<26} {'routed model':<26} {'single':>8} {'routed':>8} {'speedup':>8} "
+          f"{'tokens':>13} {'fallbk':>6} {'ROUGE-1':>8} {'judge':>5}")
+    for stage in STAGES:
+        old, new = results["single"][stage], results["routed"][stage]
+        speedup = old["seconds"] / new["seconds"] if new["seconds"] else float("nan")
+        tokens = f"{old['completion_tokens']}/{new['completion_tokens']}"
+        print(
+            f"{stage:<11} {old['model'][:26]:<26} {new['model'][:26]:<26} {old['seconds']:>7.2f}s "
+            f"{new['seconds']:>7.2f}s {speedup:>7.2f}x {tokens:>13} {new['fallbacks']:>6} "
+            f"{new['rouge1_f1']:>8.2f} {new['judge'] if new['judge'] is not None else '-':>5}"
+        )
+    total_old = sum(results["single"][s]["seconds"] for s in STAGES)
+    total_new = sum(results["routed"][s]["seconds"] for s in STAGES)
+    print(f"{'total':<11} {'':<26} {'':<26} {total_old:>7.2f}s {total_new:>7.2f}s {total_old / total_new:>7.2f}x")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2, ensure_ascii=False)
+        print(f"Saved to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,75 @@
+"""Cold-start and per-rerun overhead of the Streamlit app.
+
+    python benchmarks/bench_startup.py --reruns 20
+
+Measures, in fresh interpreters, the import time of the app's modules and
+of the optional extraction backends, then drives app.py with Streamlit's
+AppTest harness to time the first script run and the mean rerun (what
+every widget interaction costs before any PDF work). No API calls are
+made; a placeholder GROQ_API_KEY is used if none is set.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORTS = {
+    "app modules": "import llm, summarizer, chat, retrieval",
+    "pdfplumber": "import pdfplumber",
+    "pytesseract + pdf2image + PIL": "import pytesseract, pdf2image, PIL.Image",
+}
+
+
+def import_seconds(statement, repeat):
+    code = f"import time; t = time.perf_counter(); {statement}; print(time.perf_counter() - t)"
+    samples = []
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, env=os.environ
+        )
+        if result.returncode != 0:
+            return None
+        samples.append(float(result.stdout.strip().splitlines()[-1]))
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--reruns", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3, help="Fresh interpreters per import timing")
+    args = parser.parse_args()
+    os.environ.setdefault("GROQ_API_KEY", "benchmark-placeholder")
+
+    print("Cold import (median of fresh interpreters)")
+    for name, statement in IMPORTS.items():
+        seconds = import_seconds(statement, args.repeat)
+        print(f"  {name:<32} {'not installed' if seconds is None else f'{seconds * 1000:8.1f} ms'}")
+
+    from streamlit.testing.v1 import AppTest
+
+    start = time.perf_counter()
+    at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=60).run()
+    first = time.perf_counter() - start
+    if at.exception:
+        print(f"App raised: {at.exception[0].message}")
+        return 1
+
+    reruns = []
+    for _ in range(args.reruns):
+        start = time.perf_counter()
+        at.run()
+        reruns.append(time.perf_counter() - start)
+
+    print("Script runs (AppTest)")
+    print(f"  {'first run':<32} {first * 1000:8.1f} ms")
+    print(f"  {'rerun mean':<32} {statistics.mean(reruns) * 1000:8.1f} ms")
+    print(f"  {'rerun p95':<32} {sorted(reruns)[int(len(reruns) * 0.95) - 1] * 1000:8.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
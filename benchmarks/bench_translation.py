@@ -0,0 +1,123 @@
+"""Translation benchmark: LLM calls, tokens and time to get every result in another language.
+
+    python benchmarks/bench_translation.py --mock -o translation.json
+    python benchmarks/bench_translation.py --pdf report.pdf --language japanese   # against the configured LLM
+
+Produces the final summary, key points and mind map of one document in
+``--language`` three ways, from the same reduced summary input:
+
+- per-artifact: English results, then one translation call per result (the
+  old pipeline translated the summary only; key points and mind map are
+  included here so all three strategies deliver the same results)
+- batched: English results, then one structured translate_artifacts call
+- direct: every result written in the target language, no translation
+
+Reports LLM calls, prompt and completion tokens and wall time of each, from
+the trace's ``llm`` totals. The response cache is off, so every call hits
+the API. The mock answers every prompt alike, so with ``--mock`` only calls,
+prompt tokens and time are meaningful.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+from load_test import load_env, start_mock  # noqa: E402
+
+STRATEGIES = ("per-artifact", "batched", "direct")
+
+
+def run_strategy(strategy, summary_input, text, args):
+    """Final results in ``args.language``; returns ``(results, seconds, llm_summary)``"""
+    from summarizer import (
+        extract_key_points, generate_mindmap_data, summarize_text, translate_artifacts, translate_text
+    )
+    from tracing import trace
+
+    language = args.language if strategy == "direct" else "english"
+    with trace(strategy) as run_trace:
+        started = time.perf_counter()
+        results = {
+            "summary": summarize_text(summary_input, args.audience, args.length, language),
+            "key_points": extract_key_points(text, language=language),
+            "mindmap": generate_mindmap_data(text, language=language),
+        }
+        if strategy == "batched":
+            results = translate_artifacts(args.language, **results) or results
+        elif strategy == "per-artifact":
+            results = {
+                "summary": translate_text(results["summary"], args.language),
+                "key_points": translate_text(results["key_points"], args.language),
+                "mindmap": translate_text(json.dumps(results["mindmap"], ensure_ascii=False), args.language),
+            }
+        seconds = time.perf_counter() - started
+    return results, seconds, run_trace.summary().get("llm", {})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pdf", help="Document to run (default: a synthetic text PDF)")
+    parser.add_argument("--pages", type=int, default=20, help="Pages of the synthetic document")
+    parser.add_argument("--audience", default="general")
+    parser.add_argument("--length", default="medium")
+    parser.add_argument("--language", default="spanish")
+    parser.add_argument("--repeats", type=int, default=1, help="Runs per strategy (median time)")
+    parser.add_argument("--mock", action="store_true", help="Start benchmarks/mock_llm.py and use it")
+    parser.add_argument("--mock-latency", type=float, default=0.3)
+    parser.add_argument("--mock-tokens-per-sec", type=float, default=200)
+    parser.add_argument("-o", "--output", help="Write results as JSON")
+    args = parser.parse_args()
+
+    load_env(LLM_CACHE="0")
+    mock = start_mock(args, extra_env={"LLM_RPM": "0", "LLM_TPM": "0"}) if args.mock else None
+
+    try:
+        from bench_extraction import load_text
+        from summarizer import reduce_document
+
+        text = load_text(args.pdf, args.pages)
+        summary_input, _ = reduce_document(text, args.audience)
+        report = {}
+        for strategy in STRATEGIES:
+            runs = [run_strategy(strategy, summary_input, text, args) for _ in range(args.repeats)]
+            llm_stats = runs[0][2]
+            report[strategy] = {
+                "results": runs[0][0],
+                "seconds": statistics.median(run[1] for run in runs),
+                "llm_calls": llm_stats.get("calls", 0),
+                "prompt_tokens": llm_stats.get("prompt_tokens", 0),
+                "completion_tokens": llm_stats.get("completion_tokens", 0),
+                "errors": llm_stats.get("errors", 0),
+            }
+    finally:
+        if mock:
+            mock.terminate()
+
+    print(f"{len(text):,} characters, {len(summary_input):,} summarized, to {args.language}\n")
+    print(f"{'strategy':<13} {'calls':>6} {'prompt tok':>11} {'compl tok':>10} {'time':>8} {'tokens saved':>13}")
+    baseline = report["per-artifact"]
+    for strategy in STRATEGIES:
+        row = report[strategy]
+        tokens = row["prompt_tokens"] + row["completion_tokens"]
+        base_tokens = baseline["prompt_tokens"] + baseline["completion_tokens"]
+        saved = f"{1 - tokens / base_tokens:.0%}" if base_tokens else "-"
+        print(
+            f"{strategy:<13} {row['llm_calls']:>6} {row['prompt_tokens']:>11} {row['completion_tokens']:>10} "
+            f"{row['seconds']:>7.2f}s {saved:>13}"
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": report}, f, indent=2, ensure_ascii=False)
+        print(f"Saved to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
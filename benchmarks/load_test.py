@@ -0,0 +1,245 @@
+"""Load test: N concurrent users running upload -> summarize -> chat.
+
+    python benchmarks/load_test.py --mock --users 1 4 16 32 -o load.json
+    python benchmarks/load_test.py --users 8 --pdf contract.pdf   # against the configured LLM
+
+Each simulated user runs the app's pipeline in this process, as Streamlit
+sessions share one server process: extract the PDF, build the chat index,
+write the map-reduce summary with key points and mind map alongside, then
+ask ``--questions`` streamed chat questions. Every upload is made unique, so
+the extraction cache does not hide extraction cost. ``--mock`` starts
+benchmarks/mock_llm.py and points the app at it, so no quota is spent.
+Reports p50/p95/p99 per stage and throughput for each concurrency level.
+"""
+import argparse
+import io
+import json
+import math
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+QUESTIONS = [
+    "What are the main findings?",
+    "Which risks does the document mention?",
+    "What are the payment terms?",
+    "Summarize the liability clause.",
+]
+STAGES = ("flow", "extract", "index", "summary", "key_points", "mindmap", "chat_ttft", "chat")
+
+
+def percentile(values, q):
+    """Nearest-rank percentile"""
+    if not values:
+        return None
+    values = sorted(values)
+    return values[max(0, min(len(values) - 1, math.ceil(q / 100 * len(values)) - 1))]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def load_env(**overrides):
+    """Read .env, then apply ``overrides``.
+
+    Settings are read on import, so benchmarks call this (and start_mock)
+    before importing any app module.
+    """
+    try:
+        from dotenv import load_dotenv
+        load_dotenv(os.path.join(ROOT, ".env"))
+    except ImportError:
+        pass
+    os.environ.update(overrides)
+
+
+def start_mock(args, extra_args=(), extra_env=None):
+    """Start mock_llm.py with ``--mock-latency`` and ``--mock-tokens-per-sec``
+    (plus ``extra_args``) and point the app at it"""
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(HERE, "mock_llm.py"), "--port", str(port),
+         "--latency", str(args.mock_latency), "--tokens-per-sec", str(args.mock_tokens_per_sec)]
+        + [str(arg) for arg in extra_args],
+        stdout=subprocess.PIPE, text=True,
+    )
+    process.stdout.readline()  # "listening on ..."
+    # The Groq SDK posts to <base>/openai/v1/chat/completions, which the mock accepts
+    os.environ.update(LLM_BACKEND="groq", LLM_BASE_URL=f"http://127.0.0.1:{port}", LLM_API_KEY="mock")
+    os.environ.update(extra_env or {})
+    return process
+
+
+def run_flow(pdf_bytes, tag, questions):
+    """One user session; returns per-stage seconds"""
+    from chat import chat_with_document_stream
+    from retrieval import build_index
+    from summarizer import (
+        extract_key_points, extract_text_from_pdf, generate_mindmap_data, summarize_document
+    )
+
+    timings = {}
+    started = time.perf_counter()
+
+    # A trailing comment makes the upload unique without changing its content
+    upload = io.BytesIO(pdf_bytes + f"\n% {tag}\n".encode())
+    step = time.perf_counter()
+    text, _, _ = extract_text_from_pdf(upload)
+    timings["extract"] = time.perf_counter() - step
+    if not text:
+        raise ValueError("no text extracted")
+
+    step = time.perf_counter()
+    index = build_index(text)
+    timings["index"] = time.perf_counter() - step
+
+    def timed(name, fn):
+        step = time.perf_counter()
+        result = fn(text)
+        timings[name] = time.perf_counter() - step
+        return result
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        key_points = pool.submit(timed, "key_points", extract_key_points)
+        mindmap = pool.submit(timed, "mindmap", generate_mindmap_data)
+        summary = timed("summary", lambda t: summarize_document(t)[0])
+        if not summary:
+            raise RuntimeError("summary failed")
+        key_points.result()
+        mindmap.result()
+
+    history = []
+    chat_ttft, chat_total = [], []
+    for question in questions:
+        timing = {}
+        step = time.perf_counter()
+        answer = "".join(chat_with_document_stream(text, question, history, timing, index))
+        chat_total.append(time.perf_counter() - step)
+        chat_ttft.append(timing.get("ttft", chat_total[-1]))
+        history.append({"question": question, "answer": answer})
+    timings["chat_ttft"] = chat_ttft
+    timings["chat"] = chat_total
+
+    timings["flow"] = time.perf_counter() - started
+    return timings
+
+
+def run_level(users, flows_per_user, pdf_bytes, questions):
+    from llm import get_scheduler
+
+    calls_before = get_scheduler().stats()["calls"]
+    samples = {stage: [] for stage in STAGES}
+    errors = []
+    lock = threading.Lock()
+
+    def user(n):
+        for i in range(flows_per_user):
+            try:
+                timings = run_flow(pdf_bytes, f"user-{users}-{n}-{i}-{time.time_ns()}", questions)
+            except Exception as e:
+                with lock:
+                    errors.append(str(e))
+                continue
+            with lock:
+                for stage, value in timings.items():
+                    samples[stage].extend(value if isinstance(value, list) else [value])
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=user, args=(n,)) for n in range(users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    stats = get_scheduler().stats()
+    flows = len(samples["flow"])
+    return {
+        "users": users,
+        "flows": flows,
+        "errors": len(errors),
+        "error_examples": errors[:3],
+        "seconds": elapsed,
+        "flows_per_min": flows * 60 / elapsed,
+        "llm_requests_per_sec": (stats["calls"] - calls_before) / elapsed,
+        "scheduler": stats,
+        "latency": {
+            stage: {f"p{q}": percentile(values, q) for q in (50, 95, 99)}
+            for stage, values in samples.items() if values
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 4, 16], help="Concurrency levels to run")
+    parser.add_argument("--flows-per-user", type=int, default=2)
+    parser.add_argument("--questions", type=int, default=3, help="Chat questions per flow")
+    parser.add_argument("--pdf", help="PDF to upload (default: a 30-page synthetic document)")
+    parser.add_argument("--mock", action="store_true", help="Start benchmarks/mock_llm.py and use it")
+    parser.add_argument("--mock-latency", type=float, default=0.3)
+    parser.add_argument("--mock-tokens-per-sec", type=float, default=200)
+    parser.add_argument("--mock-rate-limit-prob", type=float, default=0.0)
+    parser.add_argument("--mock-rpm", type=int, default=0)
+    parser.add_argument("-o", "--output", help="Write results as JSON")
+    args = parser.parse_args()
+
+    load_env()
+    # Unique uploads would otherwise fill the real extraction cache
+    os.environ.setdefault("EXTRACTION_CACHE_DIR", tempfile.mkdtemp(prefix="load-test-"))
+    mock_args = ("--rate-limit-prob", args.mock_rate_limit_prob, "--rpm", args.mock_rpm)
+    mock = start_mock(args, mock_args) if args.mock else None
+    if mock:
+        # The mock has no account limits; let the scheduler's AIMD find its own
+        os.environ.setdefault("LLM_RPM", "0")
+        os.environ.setdefault("LLM_TPM", "0")
+
+    if args.pdf:
+        with open(args.pdf, "rb") as f:
+            pdf_bytes = f.read()
+    else:
+        from bench_extraction import corpus_file
+        with open(corpus_file("text", 30), "rb") as f:
+            pdf_bytes = f.read()
+    questions = (QUESTIONS * args.questions)[:args.questions]
+
+    levels = []
+    try:
+        print(f"{'users':>5} {'flows':>6} {'err':>4} {'flows/min':>10} {'req/s':>7} "
+              f"{'flow p50':>9} {'p95':>7} {'p99':>7} {'chat ttft p95':>14}")
+        for users in args.users:
+            level = run_level(users, args.flows_per_user, pdf_bytes, questions)
+            levels.append(level)
+            flow = level["latency"].get("flow", {})
+            ttft = level["latency"].get("chat_ttft", {})
+            fmt = lambda v: f"{v:.2f}s" if v is not None else "-"  # noqa: E731
+            print(
+                f"{users:>5} {level['flows']:>6} {level['errors']:>4} {level['flows_per_min']:>10.1f} "
+                f"{level['llm_requests_per_sec']:>7.1f} {fmt(flow.get('p50')):>9} {fmt(flow.get('p95')):>7} "
+                f"{fmt(flow.get('p99')):>7} {fmt(ttft.get('p95')):>14}"
+            )
+    finally:
+        if mock:
+            mock.terminate()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "levels": levels}, f, indent=2)
+        print(f"Saved {len(levels)} levels to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,242 @@
+"""Local OpenAI-compatible chat completions server for load tests.
+
+    python benchmarks/mock_llm.py --port 8765 --latency 0.4 --tokens-per-sec 250 --rpm 300
+
+Point the app at it with LLM_BACKEND=openai LLM_BASE_URL=http://127.0.0.1:8765/v1
+LLM_API_KEY=mock (the Groq backend works too: GROQ_BASE_URL=http://127.0.0.1:8765).
+Answers ``POST .../chat/completions``, streamed or not, after a configurable
+time to first token and at a configurable token rate. Mind-map and JSON
+prompts get valid JSON back. Rate limits are injected randomly
+(``--rate-limit-prob``) or enforced per minute (``--rpm``), as 429s with a
+Retry-After header. ``--prefill-tokens-per-sec`` makes time to first token
+grow with the prompt, as it does on real servers. ``--model-speed`` makes named models faster or slower
+and ``--fail-model`` makes them answer 503, for model routing and fallback
+tests. ``GET /stats`` returns request counters, also per model.
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = (
+    "the report finds that revenue growth depends on market risk while the contract "
+    "limits liability and the analysis shows clear results for each section"
+).split()
+
+
+class MockConfig:
+    def __init__(self, latency=0.3, jitter=0.2, tokens_per_sec=200.0, completion_tokens=150,
+                 rate_limit_prob=0.0, rpm=0, retry_after=1.0, error_prob=0.0, seed=None,
+                 model_speed=None, fail_models=(), prefill_tokens_per_sec=0.0):
+        self.latency = latency
+        self.prefill_tokens_per_sec = prefill_tokens_per_sec
+        self.jitter = jitter
+        self.tokens_per_sec = tokens_per_sec
+        self.completion_tokens = completion_tokens
+        self.rate_limit_prob = rate_limit_prob
+        self.rpm = rpm
+        self.retry_after = retry_after
+        self.error_prob = error_prob
+        self.model_speed = model_speed or {}
+        self.fail_models = set(fail_models)
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.recent = deque()
+        self.stats = {"requests": 0, "ok": 0, "rate_limited": 0, "errors": 0, "tokens": 0, "models": {}}
+
+    def admit(self, model=None):
+        """``None`` to serve the request, else the HTTP status to fail it with"""
+        now = time.monotonic()
+        with self.lock:
+            self.stats["requests"] += 1
+            self.stats["models"][model] = self.stats["models"].get(model, 0) + 1
+            if model in self.fail_models:
+                self.stats["errors"] += 1
+                return 503
+            while self.recent and now - self.recent[0] > 60:
+                self.recent.popleft()
+            if (self.rpm and len(self.recent) >= self.rpm) or self.rng.random() < self.rate_limit_prob:
+                self.stats["rate_limited"] += 1
+                return 429
+            if self.rng.random() < self.error_prob:
+                self.stats["errors"] += 1
+                return 500
+            self.recent.append(now)
+            return None
+
+    def first_token_delay(self, model=None, prompt_tokens=0):
+        with self.lock:
+            spread = self.rng.uniform(-self.jitter, self.jitter)
+        delay = max(0.0, self.latency * (1 + spread))
+        if self.prefill_tokens_per_sec:
+            delay += prompt_tokens / self.prefill_tokens_per_sec
+        return delay / self.model_speed.get(model, 1.0)
+
+
+def completion_text(prompt, max_tokens, config):
+    lowered = prompt.lower()
+    if "mind map" in lowered:
+        return json.dumps({"central": "Document", "branches": [
+            {"name": "Findings", "subbranches": ["Revenue", "Risk"]},
+            {"name": "Terms", "subbranches": ["Liability", "Payment"]},
+        ]})
+    if "json" in lowered:
+        return json.dumps({
+            "summary": "The document reports results and risks.",
+            "key_points": ["Revenue grew", "Risk is limited", "Terms are clear"],
+            "mindmap": {"central": "Document", "branches": [{"name": "Findings", "subbranches": ["Revenue"]}]},
+        })
+    count = max(1, min(max_tokens or config.completion_tokens, config.completion_tokens))
+    words = [WORDS[i % len(WORDS)] for i in range(count)]
+    if "key points" in lowered:
+        return "\n".join(f"{i}. {' '.join(words[i * 8:i * 8 + 8])}" for i in range(1, 8))
+    return " ".join(words).capitalize() + "."
+
+
+class Handler(BaseHTTPRequestHandler):
+    config = MockConfig()
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/stats"):
+            with self.config.lock:
+                self._send_json(200, dict(self.config.stats, models=dict(self.config.stats["models"])))
+        else:
+            self._send_json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+
+        config = self.config
+        model = body.get("model", "mock")
+        status = config.admit(model)
+        if status == 429:
+            self._send_json(
+                429,
+                {"error": {"message": "Rate limit reached", "type": "rate_limit_exceeded"}},
+                {"Retry-After": f"{config.retry_after:g}"},
+            )
+            return
+        if status:
+            self._send_json(status, {"error": {"message": f"Injected server error ({model})"}})
+            return
+
+        messages = body.get("messages", [])
+        prompt = "\n".join(str(m.get("content", "")) for m in messages)
+        content = completion_text(messages[-1].get("content", "") if messages else "", body.get("max_tokens"), config)
+        tokens = content.split(" ")
+        usage = {
+            "prompt_tokens": len(prompt) // 4,
+            "completion_tokens": len(tokens),
+            "total_tokens": len(prompt) // 4 + len(tokens),
+        }
+        with config.lock:
+            config.stats["ok"] += 1
+            config.stats["tokens"] += usage["total_tokens"]
+        speed = config.tokens_per_sec * config.model_speed.get(model, 1.0)
+        interval = 1 / speed if speed else 0
+        time.sleep(config.first_token_delay(model, usage["prompt_tokens"]))
+
+        if not body.get("stream"):
+            time.sleep(interval * len(tokens))
+            self._send_json(200, {
+                "id": "mock", "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                             "finish_reason": "stop"}],
+                "usage": usage,
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def event(payload):
+            data = f"data: {payload}\n\n".encode()
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+
+        chunk = {"id": "mock", "object": "chat.completion.chunk", "created": int(time.time()), "model": model}
+        for i, token in enumerate(tokens):
+            if i:
+                time.sleep(interval)
+            delta = {"content": token if i == 0 else " " + token}
+            event(json.dumps(dict(chunk, choices=[{"index": 0, "delta": delta, "finish_reason": None}])))
+        # Usage as Groq (x_groq) and OpenAI (include_usage) clients expect it
+        event(json.dumps(dict(chunk, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                              x_groq={"usage": usage})))
+        event(json.dumps(dict(chunk, choices=[], usage=usage)))
+        event("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+
+
+def serve(host="127.0.0.1", port=8765, config=None):
+    """Start the server on a daemon thread; returns the server"""
+    handler = type("ConfiguredHandler", (Handler,), {"config": config or MockConfig()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.3, help="Seconds to first token")
+    parser.add_argument("--jitter", type=float, default=0.2, help="Latency spread, as a fraction")
+    parser.add_argument("--tokens-per-sec", type=float, default=200, help="Generation speed (0 = instant)")
+    parser.add_argument("--prefill-tokens-per-sec", type=float, default=0,
+                        help="Prompt processing speed, added to the time to first token (0 = free)")
+    parser.add_argument("--completion-tokens", type=int, default=150, help="Tokens per answer (capped by max_tokens)")
+    parser.add_argument("--rate-limit-prob", type=float, default=0.0, help="Chance of a random 429")
+    parser.add_argument("--rpm", type=int, default=0, help="Requests per minute before 429s (0 = unlimited)")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--error-prob", type=float, default=0.0, help="Chance of a 500")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--model-speed", action="append", default=[], metavar="MODEL=FACTOR",
+                        help="Scale a model's speed (latency and token rate), e.g. llama-3.1-8b-instant=4")
+    parser.add_argument("--fail-model", action="append", default=[], metavar="MODEL",
+                        help="Answer every request for this model with a 503")
+    args = parser.parse_args()
+
+    config = MockConfig(
+        latency=args.latency, jitter=args.jitter, tokens_per_sec=args.tokens_per_sec,
+        completion_tokens=args.completion_tokens, rate_limit_prob=args.rate_limit_prob, rpm=args.rpm,
+        retry_after=args.retry_after, error_prob=args.error_prob, seed=args.seed,
+        model_speed={name: float(factor) for name, factor in (item.split("=", 1) for item in args.model_speed)},
+        fail_models=args.fail_model, prefill_tokens_per_sec=args.prefill_tokens_per_sec,
+    )
+    server = serve(args.host, args.port, config)
+    print(f"Mock LLM listening on http://{args.host}:{args.port}", flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
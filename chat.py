@@ -0,0 +1,225 @@
+import functools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from chunking import CHARS_PER_TOKEN, estimate_tokens
+from llm import create_completion, get_ai_response, stream_completion
+from tracing import propagate, traced
+
+# Turns kept per session; prompts only use the last few
+CHAT_HISTORY_MAX_TURNS = int(os.getenv("CHAT_HISTORY_MAX_TURNS", "50"))
+# Prompt budget for the conversation so far: running summary plus the most
+# recent turns verbatim. Older turns are folded into the summary.
+CHAT_MEMORY_TOKENS = int(os.getenv("CHAT_MEMORY_TOKENS", "1200"))
+# Share of that budget the running summary may use
+CHAT_SUMMARY_TOKENS = int(os.getenv("CHAT_SUMMARY_TOKENS", "300"))
+# Prompt budget for the document excerpts
+CHAT_CONTEXT_TOKENS = int(os.getenv("CHAT_CONTEXT_TOKENS", "1500"))
+# Summaries updated at once, across sessions
+CHAT_MEMORY_WORKERS = int(os.getenv("CHAT_MEMORY_WORKERS", "2"))
+
+
+def _truncate(text, max_tokens):
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    return text if len(text) <= max_chars else text[:max_chars].rstrip() + " …"
+
+
+def _turn_tokens(turn):
+    return estimate_tokens(turn["question"]) + estimate_tokens(turn["answer"])
+
+
+def _turn_messages(turns, budget):
+    """The newest ``turns`` that fit in ``budget`` tokens, as chat messages.
+
+    The latest turn is always included, its answer cut to fit if needed.
+    """
+    messages = []
+    for turn in reversed(turns):
+        tokens = _turn_tokens(turn)
+        if tokens > budget:
+            if messages:
+                break
+            answer = _truncate(turn["answer"], max(budget - estimate_tokens(turn["question"]), 50))
+            turn = dict(turn, answer=answer)
+        budget -= tokens
+        messages[:0] = [
+            {"role": "user", "content": turn["question"]},
+            {"role": "assistant", "content": turn["answer"]},
+        ]
+    return messages
+
+
+@traced("chat_memory")
+def summarize_conversation(summary, turns, max_tokens=CHAT_SUMMARY_TOKENS):
+    """``summary`` of the conversation so far, updated with ``turns``"""
+    exchanges = "\n\n".join(f"User: {turn['question']}\nAssistant: {turn['answer']}" for turn in turns)
+    system_prompt = "You keep a running summary of a conversation about a document."
+    user_prompt = (
+        f"Update the summary with the new exchanges. Keep facts, figures, names and open questions; "
+        f"stay under {max_tokens * 3 // 4} words.\n\n"
+        f"SUMMARY SO FAR:\n{summary or '(none)'}\n\nNEW EXCHANGES:\n{exchanges}"
+    )
+    return get_ai_response(system_prompt, user_prompt, max_tokens=max_tokens, stage="chat_memory")
+
+
+@functools.lru_cache(maxsize=None)
+def _memory_pool():
+    return ThreadPoolExecutor(max_workers=max(1, CHAT_MEMORY_WORKERS), thread_name_prefix="chat-memory")
+
+
+class ConversationMemory:
+    """What a chat prompt sees of the conversation, within a fixed token budget.
+
+    Recent turns are sent verbatim; once they outgrow their share of
+    ``max_tokens``, the oldest are folded into a running summary by a
+    background call after the answer, so the next question never waits for
+    it. Until a fold lands, turns that no longer fit are left out of the
+    prompt rather than exceeding the budget.
+    """
+
+    def __init__(self, max_tokens=CHAT_MEMORY_TOKENS, summary_tokens=CHAT_SUMMARY_TOKENS):
+        self.max_tokens = max_tokens
+        self.summary_tokens = min(summary_tokens, max_tokens // 2)
+        self.summary = ""
+        self.turns = []
+        self.folds = 0
+        self._pending = None
+        self._lock = threading.Lock()
+
+    @property
+    def turn_budget(self):
+        return self.max_tokens - self.summary_tokens
+
+    def messages(self):
+        with self._lock:
+            summary, turns = self.summary, list(self.turns)
+        messages = []
+        if summary:
+            messages.append({
+                "role": "system",
+                "content": f"Summary of the earlier conversation:\n{summary}"
+            })
+        return messages + _turn_messages(turns, self.turn_budget)
+
+    def add(self, question, answer):
+        """Record a turn; starts a background fold if recent turns are over budget"""
+        with self._lock:
+            self.turns.append({"question": question, "answer": answer or ""})
+            del self.turns[:-CHAT_HISTORY_MAX_TURNS]
+            if self._pending is not None and not self._pending.done():
+                return
+            fold = self._to_fold()
+            if not fold:
+                return
+            self._pending = _memory_pool().submit(propagate(self._fold), self.summary, fold)
+
+    def _to_fold(self):
+        """Oldest turns to summarize, leaving half the turn budget verbatim; call with the lock held"""
+        tokens = sum(_turn_tokens(turn) for turn in self.turns)
+        if tokens <= self.turn_budget:
+            return []
+        keep = self.turn_budget // 2
+        fold = []
+        for turn in self.turns[:-1]:
+            if tokens <= keep:
+                break
+            fold.append(turn)
+            tokens -= _turn_tokens(turn)
+        return fold
+
+    def _fold(self, summary, turns):
+        try:
+            updated = summarize_conversation(summary, turns, self.summary_tokens)
+        except Exception:
+            updated = None
+        if not updated:
+            # Turns stay verbatim (and out of the prompt); the next add retries
+            return
+        with self._lock:
+            self.summary = _truncate(updated.strip(), self.summary_tokens)
+            # Only drop the turns summarized; ones added meanwhile stay
+            self.turns = [turn for turn in self.turns if not any(turn is t for t in turns)]
+            self.folds += 1
+
+    def wait(self, timeout=None):
+        """Block until a running fold finishes (tests and benchmarks)"""
+        pending = self._pending
+        if pending is not None:
+            pending.result(timeout)
+
+    def stats(self):
+        prompt_tokens = sum(estimate_tokens(m["content"]) for m in self.messages())
+        with self._lock:
+            return {
+                "turns": len(self.turns),
+                "folds": self.folds,
+                "summary_tokens": estimate_tokens(self.summary),
+                "prompt_tokens": prompt_tokens,
+            }
+
+
+def _chat_context(document_text, question, index=None, timing=None, max_tokens=None):
+    """Document text for the chat prompt: the top-k retrieved chunks if indexed,
+    within ``max_tokens``"""
+    max_tokens = CHAT_CONTEXT_TOKENS if max_tokens is None else max_tokens
+    if index is None:
+        return _truncate(document_text, max_tokens)
+
+    started = time.perf_counter()
+    hits = index.search(question)
+    if timing is not None:
+        timing["retrieval"] = time.perf_counter() - started
+
+    chunks, budget = [], max_tokens
+    for chunk in [chunk for chunk, _ in hits] or index.chunks[:4]:
+        tokens = estimate_tokens(chunk.text)
+        if tokens > budget and chunks:
+            break
+        chunks.append(chunk)
+        budget -= tokens
+    # Keep document order so neighbouring passages read naturally
+    chunks.sort(key=lambda chunk: chunk.start)
+    return _truncate("\n\n---\n\n".join(chunk.text for chunk in chunks), max_tokens)
+
+
+def _chat_messages(document_text, question, chat_history, index=None, timing=None):
+    context = _chat_context(document_text, question, index, timing)
+    system_prompt = f"You are an AI assistant. Answer based on these excerpts of the document:\n\n{context}"
+
+    messages = [{"role": "system", "content": system_prompt}]
+    if isinstance(chat_history, ConversationMemory):
+        messages += chat_history.messages()
+    else:
+        messages += _turn_messages(chat_history, CHAT_MEMORY_TOKENS)
+    messages.append({"role": "user", "content": question})
+    return messages
+
+
+def append_turn(chat_history, turn, max_turns=None):
+    """Add ``turn`` to ``chat_history`` in place, dropping the oldest beyond the cap"""
+    max_turns = CHAT_HISTORY_MAX_TURNS if max_turns is None else max_turns
+    chat_history.append(turn)
+    if max_turns > 0:
+        del chat_history[:-max_turns]
+
+
+@traced("chat")
+def chat_with_document(document_text, question, chat_history=[], index=None):
+    """Answer about the document; ``chat_history`` is a ConversationMemory or a
+    list of turns (the newest that fit CHAT_MEMORY_TOKENS are sent)"""
+    messages = _chat_messages(document_text, question, chat_history, index)
+    try:
+        return create_completion(messages, stage="chat")
+    except Exception as e:
+        return f"Error: {str(e)}"
+
+
+@traced("chat")
+def chat_with_document_stream(document_text, question, chat_history=[], timing=None, index=None):
+    messages = _chat_messages(document_text, question, chat_history, index, timing)
+    try:
+        yield from stream_completion(messages, stage="chat", timing=timing)
+    except Exception as e:
+        yield f"Error: {str(e)}"
@@ -0,0 +1,137 @@
+import math
+import os
+import re
+from bisect import bisect_right
+from collections import deque, namedtuple
+
+# Chunk sizes are budgeted in estimated tokens
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "1000"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "50"))
+CHARS_PER_TOKEN = 4
+
+# Coarsest to finest; anything still too large is hard-split
+SEPARATORS = [
+    re.compile(r"\n[ \t]*\n\s*"),  # paragraphs
+    re.compile(r"\n"),  # lines
+    re.compile(r"(?<=[.!?])\s+"),  # sentences
+    re.compile(r"\s+"),  # words
+]
+
+# ``start``/``end`` are character offsets into the document text, pages are 1-based
+Chunk = namedtuple("Chunk", ["text", "start", "end", "page_start", "page_end"])
+
+
+def estimate_tokens(text):
+    """Cheap token estimate (~4 characters per token for English text)"""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _split_spans(text, start, end, max_chars, level=0):
+    """Yield contiguous ``(start, end)`` spans covering ``text[start:end]``.
+
+    Each span is at most ``max_chars`` long and is cut at the coarsest
+    separator that makes it fit. Every level scans its range once, so the
+    whole split is linear in the input size.
+    """
+    if end - start <= max_chars:
+        yield start, end
+        return
+
+    if level == len(SEPARATORS):
+        for pos in range(start, end, max_chars):
+            yield pos, min(pos + max_chars, end)
+        return
+
+    pos = start
+    for match in SEPARATORS[level].finditer(text, start, end):
+        # Separators stay attached to the piece before them
+        if match.end() > pos:
+            yield from _split_spans(text, pos, match.end(), max_chars, level + 1)
+            pos = match.end()
+    if pos < end:
+        yield from _split_spans(text, pos, end, max_chars, level + 1)
+
+
+def _make_chunk(window):
+    parts = []
+    prev_end = None
+    for start, end, _, piece in window:
+        if prev_end is not None and start > prev_end:
+            parts.append("\n")  # page separator
+        parts.append(piece)
+        prev_end = end
+    raw = "".join(parts)
+    text = raw.strip()
+    if not text:
+        return None
+    start = window[0][0] + (len(raw) - len(raw.lstrip()))
+    end = window[-1][1] - (len(raw) - len(raw.rstrip()))
+    return Chunk(text, start, end, window[0][2], window[-1][2])
+
+
+def iter_page_chunks(pages, max_tokens=None, overlap_tokens=None):
+    """Yield chunks from an iterable of page texts as soon as each one is full.
+
+    Offsets refer to the document text the app builds from the same pages,
+    ``"\\n".join`` of the non-empty pages, stripped. Consecutive chunks share
+    up to ``overlap_tokens`` of trailing text. Runs in linear time: every
+    span is appended to and popped from the window once.
+    """
+    max_tokens = CHUNK_TOKENS if max_tokens is None else max_tokens
+    overlap_tokens = CHUNK_OVERLAP_TOKENS if overlap_tokens is None else overlap_tokens
+    max_chars = max(1, max_tokens * CHARS_PER_TOKEN)
+    overlap_chars = min(overlap_tokens * CHARS_PER_TOKEN, max_chars // 2)
+
+    window = deque()  # (start, end, page_number, text)
+    pos = None
+    for page_number, page in enumerate(pages, 1):
+        if not page.strip():
+            continue
+        if pos is None:
+            # Leading whitespace of the first page is stripped from the document
+            pos = -(len(page) - len(page.lstrip()))
+        else:
+            pos += 1
+
+        for start, end in _split_spans(page, 0, len(page), max_chars):
+            span = (pos + start, pos + end, page_number, page[start:end])
+            if window and span[1] - window[0][0] > max_chars:
+                chunk = _make_chunk(window)
+                if chunk:
+                    yield chunk
+                # Keep a tail of at most overlap_chars that still leaves room for span
+                tail_end = window[-1][1]
+                while window and (
+                    tail_end - window[0][0] > overlap_chars or span[1] - window[0][0] > max_chars
+                ):
+                    window.popleft()
+            window.append(span)
+        pos += len(page)
+
+    if window:
+        chunk = _make_chunk(window)
+        if chunk:
+            yield chunk
+
+
+def chunk_document(text, max_tokens=None, overlap_tokens=None, page_offsets=None):
+    """Chunk a whole document string.
+
+    ``page_offsets`` (sorted start offsets of each page in ``text``) is used
+    to fill in page numbers; without it every chunk is on page 1.
+    """
+    # Offsets from iter_page_chunks are relative to the stripped text
+    lead = len(text) - len(text.lstrip())
+    chunks = [
+        chunk._replace(start=chunk.start + lead, end=chunk.end + lead)
+        for chunk in iter_page_chunks([text], max_tokens, overlap_tokens)
+    ]
+    if not page_offsets:
+        return chunks
+    return [
+        chunk._replace(
+            page_start=bisect_right(page_offsets, chunk.start),
+            page_end=bisect_right(page_offsets, max(chunk.start, chunk.end - 1)),
+        )
+        for chunk in chunks
+    ]
@@ -0,0 +1,197 @@
+import functools
+import hashlib
+import os
+import threading
+import time
+import weakref
+import zlib
+from collections import OrderedDict, deque
+
+from memo import LRUMemo
+from retrieval import build_index
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+# Compressed size of unreferenced documents kept for reopening; documents a
+# session still holds are never evicted
+DOC_STORE_MAX_MB = float(os.getenv("DOC_STORE_MAX_MB", "256"))
+DOC_STORE_CODEC = os.getenv("DOC_STORE_CODEC", "zstd" if ZSTD_AVAILABLE else "zlib")
+DOC_STORE_LEVEL = int(os.getenv("DOC_STORE_LEVEL", "3" if DOC_STORE_CODEC == "zstd" else "6"))
+# Decompressed texts kept around, so a rerun does not decompress again
+DOC_STORE_HOT_DOCS = int(os.getenv("DOC_STORE_HOT_DOCS", "8"))
+
+
+def _compress(data, codec, level):
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    return zlib.compress(data, level)
+
+
+def _decompress(data, codec):
+    if codec == "zstd":
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+class DocumentHandle:
+    """A session's reference to a stored document.
+
+    The reference is released when the handle is garbage collected, i.e.
+    when the session replaces it or the session itself goes away.
+    """
+
+    def __init__(self, store, key):
+        self.key = key
+        self._store = store
+        # Finalizers run at arbitrary points (possibly inside a store method
+        # holding its lock), so they only queue the release
+        weakref.finalize(self, store._released.append, key)
+
+    @property
+    def text(self):
+        return self._store.text(self.key)
+
+    @property
+    def index(self):
+        """Retrieval index, built once per document and shared"""
+        return self._store.index(self.key)
+
+    def read(self):
+        return self.text
+
+
+class _Entry:
+    __slots__ = ("data", "size", "refs", "index", "index_seconds", "lock")
+
+    def __init__(self, data, size):
+        self.data = data
+        self.size = size
+        self.refs = 0
+        self.index = None
+        self.index_seconds = 0.0
+        self.lock = threading.Lock()
+
+
+class DocumentStore:
+    """Process-wide extracted texts, deduplicated by content hash.
+
+    Texts are stored compressed and decompressed on access (the last few
+    stay hot). Sessions hold DocumentHandles; a document nobody holds stays
+    until the compressed total exceeds ``max_bytes``, least recently used
+    first, so reopening a recent upload costs nothing.
+    """
+
+    def __init__(self, max_bytes=int(DOC_STORE_MAX_MB * 1024 * 1024), codec=DOC_STORE_CODEC,
+                 level=DOC_STORE_LEVEL, hot_docs=DOC_STORE_HOT_DOCS):
+        if codec == "zstd" and not ZSTD_AVAILABLE:
+            codec = "zlib"
+        self.max_bytes = max_bytes
+        self.codec = codec
+        self.level = level
+        self._entries = OrderedDict()
+        self._hot = LRUMemo(max(hot_docs, 1))
+        self._released = deque()
+        self._lock = threading.Lock()
+
+    def put(self, text):
+        """Handle to ``text``, compressing it only if it is not stored yet"""
+        data = text.encode("utf-8")
+        key = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.refs += 1
+                self._entries.move_to_end(key)
+        if entry is None:
+            compressed = _compress(data, self.codec, self.level)
+            with self._lock:
+                entry = self._entries.setdefault(key, _Entry(compressed, len(data)))
+                entry.refs += 1
+                self._entries.move_to_end(key)
+        self._hot.put(key, text)
+        self._evict()
+        return DocumentHandle(self, key)
+
+    def open(self, key):
+        """Another handle to a stored document; ``KeyError`` if it was evicted"""
+        with self._lock:
+            self._collect()
+            entry = self._entries[key]
+            entry.refs += 1
+            self._entries.move_to_end(key)
+        return DocumentHandle(self, key)
+
+    def _entry(self, key):
+        with self._lock:
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def text(self, key):
+        text = self._hot.get(key)
+        if text is None:
+            text = _decompress(self._entry(key).data, self.codec).decode("utf-8")
+            self._hot.put(key, text)
+        return text
+
+    def index(self, key):
+        entry = self._entry(key)
+        with entry.lock:
+            if entry.index is None:
+                started = time.perf_counter()
+                entry.index = build_index(self.text(key))
+                entry.index_seconds = time.perf_counter() - started
+            return entry.index
+
+    def index_seconds(self, key):
+        return self._entry(key).index_seconds
+
+    def _collect(self):
+        """Apply releases queued by collected handles; call with the lock held"""
+        while self._released:
+            entry = self._entries.get(self._released.popleft())
+            if entry is not None:
+                entry.refs -= 1
+                if entry.refs == 0:
+                    # Nobody can query it until it is opened again
+                    entry.index = None
+
+    def _evict(self):
+        with self._lock:
+            self._collect()
+            evicted = []
+            total = sum(len(entry.data) for entry in self._entries.values())
+            for key in list(self._entries):
+                if total <= self.max_bytes:
+                    break
+                entry = self._entries[key]
+                if entry.refs > 0:
+                    continue
+                del self._entries[key]
+                evicted.append(key)
+                total -= len(entry.data)
+        for key in evicted:
+            self._hot.pop(key)
+
+    def stats(self):
+        with self._lock:
+            self._collect()
+            entries = list(self._entries.values())
+        size = sum(entry.size for entry in entries)
+        stored = sum(len(entry.data) for entry in entries)
+        return {
+            "documents": len(entries),
+            "references": sum(entry.refs for entry in entries),
+            "text_bytes": size,
+            "stored_bytes": stored,
+            "ratio": size / stored if stored else 0.0,
+            "codec": self.codec,
+        }
+
+
+@functools.lru_cache(maxsize=None)
+def get_document_store():
+    return DocumentStore()
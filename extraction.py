@@ -0,0 +1,265 @@
+import hashlib
+import importlib.util
+import io
+import logging
+import mmap
+import os
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+
+import PyPDF2
+
+# Optional OCR backend; only imported by the workers that actually OCR a page
+OCR_AVAILABLE = all(importlib.util.find_spec(name) for name in ("pytesseract", "pdf2image"))
+
+logger = logging.getLogger(__name__)
+
+# Parallel extraction settings
+EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", os.cpu_count() or 1))
+PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "50"))
+# Pages read before PyPDF2's object cache (images, fonts, content streams)
+# is dropped; keeps a serial read of a large upload from holding it all
+READER_BATCH_PAGES = int(os.getenv("PDF_READER_BATCH_PAGES", "32"))
+
+# OCR settings
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", os.cpu_count() or 1))
+OCR_DPI = int(os.getenv("OCR_DPI", "200"))
+OCR_GRAYSCALE = os.getenv("OCR_GRAYSCALE", "1") != "0"
+OCR_MIN_CHARS = int(os.getenv("OCR_MIN_CHARS", "20"))
+
+# Uploads are spooled here (default: the system temp dir) and memory-mapped
+SPOOL_DIR = os.getenv("PDF_SPOOL_DIR") or None
+SPOOL_BLOCK = 1024 * 1024
+
+# Under Streamlit, __main__ is app.py itself, so "spawn"/"forkserver" workers
+# would re-execute the whole script on startup. Prefer "fork" where it exists.
+MP_START_METHOD = os.getenv(
+    "PDF_MP_START_METHOD",
+    "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn",
+)
+
+
+def _mp_context():
+    return multiprocessing.get_context(MP_START_METHOD)
+
+
+class MappedStream(io.RawIOBase):
+    """Read-only, seekable file object over a memory map.
+
+    Each stream keeps its own position, so several readers can share one
+    mapping; reads copy only the bytes they return.
+    """
+
+    def __init__(self, mapped):
+        self._map = mapped
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += len(self._map)
+        if offset < 0:
+            raise ValueError("negative seek position")
+        self._pos = offset
+        return offset
+
+    def read(self, size=-1):
+        end = len(self._map) if size is None or size < 0 else min(self._pos + size, len(self._map))
+        data = self._map[self._pos:end] if end > self._pos else b""
+        self._pos += len(data)
+        return data
+
+    def readall(self):
+        return self.read()
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+class SpooledPDF:
+    """An upload spooled once to a temp file and memory-mapped read-only.
+
+    In-process backends read it through :meth:`open`, worker processes and
+    poppler through :attr:`path`, so the document is never held as another
+    ``bytes`` copy or pickled to workers. ``sha256`` is computed while
+    spooling. Use as a context manager; closing deletes the file.
+    """
+
+    def __init__(self, pdf_file, directory=None):
+        digest = hashlib.sha256()
+        fd, self.path = tempfile.mkstemp(suffix=".pdf", dir=directory or SPOOL_DIR)
+        try:
+            with os.fdopen(fd, "wb") as out:
+                if hasattr(pdf_file, "getbuffer"):
+                    # BytesIO / Streamlit UploadedFile: write from its buffer without a copy
+                    with pdf_file.getbuffer() as view:
+                        for start in range(0, len(view), SPOOL_BLOCK):
+                            block = view[start:start + SPOOL_BLOCK]
+                            digest.update(block)
+                            out.write(block)
+                else:
+                    while True:
+                        block = pdf_file.read(SPOOL_BLOCK)
+                        if not block:
+                            break
+                        digest.update(block)
+                        out.write(block)
+                    pdf_file.seek(0)
+            self.size = os.path.getsize(self.path)
+            if not self.size:
+                raise ValueError("The PDF file is empty")
+            with open(self.path, "rb") as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except BaseException:
+            os.remove(self.path)
+            raise
+        self.sha256 = digest.hexdigest()
+
+    def open(self):
+        """A new file object over the shared mapping"""
+        return MappedStream(self._map)
+
+    def close(self):
+        if not self._map.closed:
+            self._map.close()
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _extract_page_range(pdf_path, start, end):
+    """Worker: extract text for pages [start, end) with PyPDF2"""
+    with open(pdf_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        reader = PyPDF2.PdfReader(MappedStream(mapped))
+        return [reader.pages[i].extract_text() or "" for i in range(start, end)]
+
+
+def _ocr_page(pdf_path, page_number, dpi, grayscale):
+    """Worker: rasterize a single 1-based page and run tesseract on it"""
+    import pytesseract
+    from pdf2image import convert_from_path
+
+    images = convert_from_path(
+        pdf_path, dpi=dpi, first_page=page_number, last_page=page_number, grayscale=grayscale
+    )
+    return "\n".join(pytesseract.image_to_string(img) for img in images)
+
+
+def _page_ranges(page_count, parts):
+    size, extra = divmod(page_count, parts)
+    ranges = []
+    start = 0
+    for i in range(parts):
+        end = start + size + (1 if i < extra else 0)
+        if end > start:
+            ranges.append((start, end))
+        start = end
+    return ranges
+
+
+def iter_pages(pdf, workers=None, min_pages=None):
+    """Yield per-page text with PyPDF2, in page order, as pages become ready.
+
+    Documents with at least ``min_pages`` pages are split into contiguous
+    page ranges across a process pool; smaller ones are read serially since
+    pool startup would cost more than it saves. Ranges are kept small so
+    the first pages reach the consumer while later ones are still parsed.
+    ``pdf`` is a :class:`SpooledPDF`; workers map its file themselves.
+    """
+    workers = EXTRACT_WORKERS if workers is None else workers
+    min_pages = PARALLEL_MIN_PAGES if min_pages is None else min_pages
+
+    reader = PyPDF2.PdfReader(pdf.open())
+    page_count = len(reader.pages)
+
+    if workers <= 1 or page_count < max(min_pages, 2):
+        for i, page in enumerate(reader.pages):
+            yield page.extract_text() or ""
+            if (i + 1) % READER_BATCH_PAGES == 0:
+                # Objects are re-read from the mapping on demand
+                reader.resolved_objects.clear()
+        return
+
+    ranges = _page_ranges(page_count, min(workers * 4, page_count))
+    pool = ProcessPoolExecutor(max_workers=min(workers, len(ranges)), mp_context=_mp_context())
+    try:
+        futures = [pool.submit(_extract_page_range, pdf.path, start, end) for start, end in ranges]
+        for future in futures:
+            yield from future.result()
+    finally:
+        # Consumer may stop early; don't wait for ranges nobody will read
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def extract_pages(pdf, workers=None, min_pages=None):
+    """List form of :func:`iter_pages`"""
+    return list(iter_pages(pdf, workers, min_pages))
+
+
+def _resolve_ocr(page_number, text, future):
+    if future is None:
+        return text
+    try:
+        ocr_text = future.result()
+    except Exception as e:
+        logger.warning("OCR failed on page %d: %s", page_number, e)
+        return text
+    return ocr_text if len(ocr_text.strip()) > len(text.strip()) else text
+
+
+def iter_pages_ocr(pdf, pages=None, min_chars=None, dpi=None, grayscale=None, workers=None):
+    """Yield page text, OCRing pages whose embedded text is too short.
+
+    ``pages`` is the embedded-text page iterator (defaults to
+    :func:`iter_pages`). Pages with fewer than ``min_chars`` characters are
+    rasterized one at a time in a process pool while later pages keep
+    flowing; output stays in page order. Text-only documents never start the
+    pool.
+    """
+    pages = iter_pages(pdf) if pages is None else pages
+    min_chars = OCR_MIN_CHARS if min_chars is None else min_chars
+    dpi = OCR_DPI if dpi is None else dpi
+    grayscale = OCR_GRAYSCALE if grayscale is None else grayscale
+    workers = OCR_WORKERS if workers is None else workers
+
+    pool = None
+    pending = deque()
+    try:
+        for i, text in enumerate(pages):
+            future = None
+            if len(text.strip()) < min_chars:
+                if pool is None:
+                    pool = ProcessPoolExecutor(max_workers=max(workers, 1), mp_context=_mp_context())
+                # Workers render from the spooled file, so the PDF isn't pickled per page
+                future = pool.submit(_ocr_page, pdf.path, i + 1, dpi, grayscale)
+            pending.append((i + 1, text, future))
+
+            while pending and (pending[0][2] is None or pending[0][2].done()):
+                yield _resolve_ocr(*pending.popleft())
+
+        while pending:
+            yield _resolve_ocr(*pending.popleft())
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
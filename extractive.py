@@ -0,0 +1,176 @@
+import os
+import re
+
+import numpy as np
+
+from chunking import CHUNK_TOKENS, chunk_document, estimate_tokens
+from retrieval import tokenize
+
+# Share of each map chunk's tokens kept for the LLM (1 = send chunks whole)
+EXTRACTIVE_RATIO = float(os.getenv("EXTRACTIVE_RATIO", "0.35"))
+# Shorter sentences (page numbers, running headers) are dropped, unless the
+# chunk is mostly short lines (tables, line items) and too little would remain
+EXTRACTIVE_MIN_WORDS = int(os.getenv("EXTRACTIVE_MIN_WORDS", "4"))
+# Sentences in the instant preview, and chunks sampled to pick them
+EXTRACTIVE_PREVIEW_SENTENCES = int(os.getenv("EXTRACTIVE_PREVIEW_SENTENCES", "5"))
+EXTRACTIVE_PREVIEW_CHUNKS = int(os.getenv("EXTRACTIVE_PREVIEW_CHUNKS", "64"))
+
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\n[ \t]*\n\s*")
+# Longer "sentences" (unpunctuated text, tables) are split into their lines
+MAX_SENTENCE_CHARS = 600
+
+
+def split_sentences(text):
+    sentences = []
+    for piece in SENTENCE_RE.split(text):
+        lines = piece.splitlines() if len(piece) > MAX_SENTENCE_CHARS else [piece]
+        sentences += [" ".join(line.split()) for line in lines if line and not line.isspace()]
+    return sentences
+
+
+def _sentence_vectors(tokenized):
+    """Unit-length TF-IDF rows, one per sentence (sublinear term frequency)"""
+    vocab = {}
+    rows = np.repeat(np.arange(len(tokenized)), [len(tokens) for tokens in tokenized])
+    cols = np.fromiter(
+        (vocab.setdefault(token, len(vocab)) for tokens in tokenized for token in tokens),
+        dtype=np.int64, count=len(rows),
+    )
+    matrix = np.zeros((len(tokenized), len(vocab)), dtype=np.float32)
+    np.add.at(matrix, (rows, cols), 1)
+    df = np.count_nonzero(matrix, axis=0)
+    idf = np.log((1 + len(tokenized)) / (1 + df)) + 1
+    matrix = np.log1p(matrix) * idf.astype(np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms > 0, norms, 1)
+
+
+def textrank(sentences, damping=0.85, iterations=50, tol=1e-6):
+    """Centrality score of each sentence: PageRank over their cosine-similarity graph"""
+    n = len(sentences)
+    if n < 3:
+        return np.full(n, 1.0 / max(n, 1))
+    vectors = _sentence_vectors([tokenize(s) for s in sentences])
+    similarity = vectors @ vectors.T
+    np.fill_diagonal(similarity, 0)
+    out = similarity.sum(axis=1, keepdims=True)
+    # Sentences sharing no words with any other link to all of them
+    transition = np.divide(similarity, out, out=np.full_like(similarity, 1.0 / n), where=out > 0)
+    scores = np.full(n, 1.0 / n, dtype=np.float32)
+    for _ in range(iterations):
+        updated = (1 - damping) / n + damping * (transition.T @ scores)
+        done = np.abs(updated - scores).sum() < tol
+        scores = updated
+        if done:
+            break
+    return scores
+
+
+def condense(text, ratio=None, seen=None):
+    """The most central sentences of ``text``, in order, up to ``ratio`` of its tokens.
+
+    ``seen`` (a set, updated) drops sentences already kept from earlier
+    chunks, so boilerplate repeated on every page is sent at most once.
+    """
+    ratio = EXTRACTIVE_RATIO if ratio is None else ratio
+    if ratio >= 1:
+        return text
+    candidates = [s for s in split_sentences(text) if seen is None or s.lower() not in seen]
+    # Counted in characters: per-sentence token estimates round up, which
+    # would leave tables of short lines well under the ratio
+    budget = ratio * len(text)
+    sentences = [s for s in candidates if len(tokenize(s)) >= EXTRACTIVE_MIN_WORDS]
+    if sum(len(s) + 1 for s in sentences) < budget:
+        sentences = candidates
+    if not sentences:
+        return ""
+
+    scores = textrank(sentences)
+    keep = []
+    for i in np.argsort(-scores, kind="stable"):
+        if keep and budget <= 0:
+            break
+        keep.append(i)
+        budget -= len(sentences[i]) + 1
+    keep.sort()
+    if seen is not None:
+        seen.update(sentences[i].lower() for i in keep)
+    return " ".join(sentences[i] for i in keep)
+
+
+class ChunkCondenser:
+    """Extractive pre-summarization between chunking and the map calls.
+
+    Each chunk added is cut down to its most central sentences, and the
+    results are packed back into chunks of up to ``max_tokens``, so the map
+    stage makes fewer, smaller calls. Works on a stream: ``add`` returns the
+    packed chunks completed so far, ``flush`` the rest.
+    """
+
+    def __init__(self, ratio=None, max_tokens=None):
+        self.ratio = EXTRACTIVE_RATIO if ratio is None else ratio
+        self.max_tokens = max_tokens or CHUNK_TOKENS
+        self.tokens_in = 0
+        self.tokens_out = 0
+        self._seen = set()
+        self._parts = []
+        self._size = 0
+
+    def add(self, text):
+        self.tokens_in += estimate_tokens(text)
+        if self.ratio >= 1:
+            self.tokens_out += estimate_tokens(text)
+            return [text]
+        # Nothing left to rank: send the chunk whole rather than lose it
+        condensed = condense(text, self.ratio, self._seen) or text
+        tokens = estimate_tokens(condensed)
+        self.tokens_out += tokens
+        ready = []
+        if self._parts and self._size + tokens > self.max_tokens:
+            ready = self.flush()
+        self._parts.append(condensed)
+        self._size += tokens
+        return ready
+
+    def flush(self):
+        if not self._parts:
+            return []
+        packed = "\n\n".join(self._parts)
+        self._parts, self._size = [], 0
+        return [packed]
+
+    def stats(self):
+        return {"tokens_in": self.tokens_in, "tokens_out": self.tokens_out}
+
+
+def condense_chunks(chunks, ratio=None, max_tokens=None, stats=None):
+    """ChunkCondenser over a list of chunk texts; ``stats`` (a dict) gets its token counts"""
+    condenser = ChunkCondenser(ratio, max_tokens)
+    packed = [out for chunk in chunks for out in condenser.add(chunk)] + condenser.flush()
+    if stats is not None:
+        stats.update(condenser.stats())
+    return packed
+
+
+def preview_summary(text, num_sentences=None, max_chunks=None):
+    """A few key sentences of the document, picked locally in well under a second.
+
+    Takes the best sentences of up to ``max_chunks`` evenly spaced chunks,
+    then the most central of those. Returns ``None`` for empty text.
+    """
+    num_sentences = num_sentences or EXTRACTIVE_PREVIEW_SENTENCES
+    max_chunks = max_chunks or EXTRACTIVE_PREVIEW_CHUNKS
+    chunks = chunk_document(text)
+    step = max(1, len(chunks) / max_chunks)
+    candidates = []
+    for n in range(min(len(chunks), max_chunks)):
+        sentences = [s for s in split_sentences(chunks[int(n * step)].text)
+                     if len(tokenize(s)) >= EXTRACTIVE_MIN_WORDS]
+        scores = textrank(sentences)
+        candidates += [sentences[i] for i in np.argsort(-scores, kind="stable")[:num_sentences]]
+    candidates = list(dict.fromkeys(candidates))
+    if not candidates:
+        return None
+    scores = textrank(candidates)
+    keep = sorted(np.argsort(-scores, kind="stable")[:num_sentences])
+    return " ".join(candidates[i] for i in keep)
@@ -0,0 +1,145 @@
+import contextvars
+import functools
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# Analyses run at once; more are queued
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+# Finished jobs stay attachable (and their results readable) this long
+JOB_TTL_SECONDS = float(os.getenv("JOB_TTL_SECONDS", "900"))
+# How often the UI polls a running job
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "0.5"))
+
+ACTIVE = ("queued", "running")
+
+_job = contextvars.ContextVar("job", default=None)
+
+
+class Job:
+    """One background run: status, progress counters, partial output and result"""
+
+    def __init__(self, key):
+        self.id = uuid.uuid4().hex[:12]
+        self.key = key
+        self.status = "queued"
+        self.progress = {}
+        self.partial = ""
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+        self._lock = threading.Lock()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "id": self.id,
+                "status": self.status,
+                "progress": dict(self.progress),
+                "partial": self.partial,
+                "result": self.result,
+                "error": self.error,
+                "elapsed": (self.finished or time.time()) - self.created,
+            }
+
+
+def report(**values):
+    """Set progress fields (e.g. the current ``stage``) of the running job"""
+    job = _job.get()
+    if job is None:
+        return
+    with job._lock:
+        job.progress.update(values)
+
+
+def advance(**increments):
+    """Add to progress counters of the running job; a no-op outside a job"""
+    job = _job.get()
+    if job is None:
+        return
+    with job._lock:
+        for key, value in increments.items():
+            job.progress[key] = job.progress.get(key, 0) + value
+
+
+def collect_stream(chunks):
+    """Join a token stream, publishing the text so far as the job's partial output"""
+    job = _job.get()
+    parts = []
+    for chunk in chunks:
+        parts.append(chunk)
+        if job is not None:
+            with job._lock:
+                job.partial = "".join(parts)
+    return "".join(parts)
+
+
+class JobQueue:
+    """Worker pool plus a table of jobs keyed by their input.
+
+    Submitting a key that already has a queued, running or recently finished
+    job returns that job instead of starting another, so a refreshed or
+    second session attaches to the work already in progress. Failed jobs
+    are not reused: submitting again retries.
+    """
+
+    def __init__(self, workers=JOB_WORKERS, ttl=JOB_TTL_SECONDS):
+        self.ttl = ttl
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="job")
+        self._jobs = {}
+        self._by_key = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key, fn, *args, **kwargs):
+        """Returns ``(job, attached)``; ``attached`` if the job already existed"""
+        with self._lock:
+            self._prune()
+            job = self._jobs.get(self._by_key.get(key))
+            if job is not None and job.status != "error":
+                return job, True
+            job = Job(key)
+            self._jobs[job.id] = job
+            self._by_key[key] = job.id
+        self._pool.submit(self._run, job, fn, args, kwargs)
+        return job, False
+
+    def _run(self, job, fn, args, kwargs):
+        with job._lock:
+            job.status = "running"
+        token = _job.set(job)
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            with job._lock:
+                job.status, job.error, job.finished = "error", str(e), time.time()
+            return
+        finally:
+            _job.reset(token)
+        with job._lock:
+            job.status, job.result, job.finished = "done", result, time.time()
+
+    def get(self, job_id):
+        with self._lock:
+            self._prune()
+            return self._jobs.get(job_id)
+
+    def _prune(self):
+        now = time.time()
+        for job_id, job in list(self._jobs.items()):
+            if job.finished is not None and now - job.finished > self.ttl:
+                del self._jobs[job_id]
+                if self._by_key.get(job.key) == job_id:
+                    del self._by_key[job.key]
+
+    def stats(self):
+        with self._lock:
+            statuses = [job.status for job in self._jobs.values()]
+        return {status: statuses.count(status) for status in ("queued", "running", "done", "error")}
+
+
+@functools.lru_cache(maxsize=None)
+def get_job_queue():
+    return JobQueue()
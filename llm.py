@@ -0,0 +1,310 @@
+import functools
+import json
+import logging
+import os
+import time
+from collections import namedtuple
+
+import httpx
+from groq import DefaultHttpxClient, Groq
+
+from chunking import estimate_tokens
+from response_cache import LLM_CACHE_ENABLED, ResponseCache, response_key
+from scheduler import RequestScheduler
+from tracing import annotate, traced
+
+logger = logging.getLogger(__name__)
+
+# "groq" (Groq SDK) or "openai" (OpenAI SDK, for any OpenAI-compatible server:
+# vLLM, llama.cpp, benchmarks/mock_llm.py, ...); LLM_BASE_URL overrides the host
+LLM_BACKEND = os.getenv("LLM_BACKEND", "groq")
+LLM_BASE_URL = os.getenv("LLM_BASE_URL") or None
+LLM_MODEL = os.getenv("LLM_MODEL", "llama-3.3-70b-versatile")
+API_KEY_ENV = "OPENAI_API_KEY" if LLM_BACKEND == "openai" else "GROQ_API_KEY"
+# Keep-alive pool shared by every session and worker thread in the process
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "32"))
+
+# Small model for high-volume, simple stages (map summaries, translation)
+LLM_FAST_MODEL = os.getenv("LLM_FAST_MODEL", "llama-3.1-8b-instant" if LLM_BACKEND == "groq" else LLM_MODEL)
+# Retries on a stage's model before switching to its fallback
+LLM_FALLBACK_RETRIES = int(os.getenv("LLM_FALLBACK_RETRIES", "1"))
+
+# ``timeout`` is seconds per request (per read for streams); ``fallback`` is
+# tried when the model errors or times out, None to disable
+Route = namedtuple("Route", ["model", "max_tokens", "temperature", "fallback", "timeout"])
+
+ROUTES = {
+    "map": Route(LLM_FAST_MODEL, 400, 0.3, LLM_MODEL, 30),
+    "reduce": Route(LLM_MODEL, 1000, 0.5, LLM_FAST_MODEL, 60),
+    "summary": Route(LLM_MODEL, 2000, 0.7, LLM_FAST_MODEL, 90),
+    "translate": Route(LLM_FAST_MODEL, 2000, 0.3, LLM_MODEL, 60),
+    "key_points": Route(LLM_MODEL, 1500, 0.7, LLM_FAST_MODEL, 60),
+    "mindmap": Route(LLM_MODEL, 1500, 0.7, LLM_FAST_MODEL, 60),
+    "combined": Route(LLM_MODEL, 3000, 0.5, LLM_FAST_MODEL, 90),
+    "chat": Route(LLM_MODEL, 1000, 0.6, LLM_FAST_MODEL, 60),
+    "chat_memory": Route(LLM_FAST_MODEL, 400, 0.3, LLM_MODEL, 30),
+    "default": Route(LLM_MODEL, 1500, 0.7, LLM_FAST_MODEL, 60),
+}
+# JSON overrides per stage, e.g. {"translate": {"model": "llama-3.3-70b-versatile"}, "chat": {"fallback": null}}
+for _stage, _fields in json.loads(os.getenv("LLM_ROUTES") or "{}").items():
+    ROUTES[_stage] = ROUTES.get(_stage, ROUTES["default"])._replace(**_fields)
+
+_client = None
+
+
+def default_api_key():
+    return os.getenv("LLM_API_KEY") or os.getenv(API_KEY_ENV)
+
+
+def configure_client(api_key=None):
+    """Create the client used by every call (key defaults to default_api_key()).
+
+    The client owns a keep-alive connection pool, so it should be created
+    once per process and reused; reconnecting costs a TLS handshake. Its own
+    retries are disabled: the request scheduler retries, so that backoff is
+    shared with every other call.
+    """
+    global _client
+    if LLM_BACKEND == "groq":
+        client_class = Groq
+    elif LLM_BACKEND == "openai":
+        from openai import OpenAI as client_class
+    else:
+        raise ValueError(f"Unknown LLM_BACKEND {LLM_BACKEND!r} (expected 'groq' or 'openai')")
+
+    http_client = DefaultHttpxClient(
+        limits=httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_CONNECTIONS,
+            keepalive_expiry=60,
+        )
+    )
+    _client = client_class(
+        api_key=api_key or default_api_key(),
+        base_url=LLM_BASE_URL,
+        http_client=http_client,
+        max_retries=0,
+    )
+    return _client
+
+
+def get_client():
+    return _client if _client is not None else configure_client()
+
+
+@functools.lru_cache(maxsize=None)
+def get_response_cache():
+    return ResponseCache() if LLM_CACHE_ENABLED else None
+
+
+@functools.lru_cache(maxsize=None)
+def get_scheduler():
+    """Rate limits and adaptive concurrency shared by every session"""
+    return RequestScheduler()
+
+
+def get_route(stage=None):
+    return ROUTES.get(stage) or ROUTES["default"]
+
+
+def _models(route):
+    """The route's model, then its fallback if it has a different one"""
+    if route.fallback and route.fallback != route.model:
+        return [route.model, route.fallback]
+    return [route.model]
+
+
+def _reserved_tokens(messages, max_tokens):
+    """Tokens-per-minute charge for a request until its real usage is known"""
+    return sum(estimate_tokens(m["content"]) for m in messages) + max_tokens
+
+
+def _annotate_usage(usage, timing):
+    annotate(
+        queue=timing.get("queue", 0),
+        prompt_tokens=getattr(usage, "prompt_tokens", 0),
+        completion_tokens=getattr(usage, "completion_tokens", 0),
+    )
+
+
+def _complete(model, messages, temperature, max_tokens, timeout, timing, max_retries=None):
+    cache = get_response_cache()
+    if cache:
+        # Deterministic sampling so a cached answer is a valid answer
+        temperature = 0
+        key = response_key(model, messages, temperature, max_tokens)
+        cached = cache.get(key)
+        if cached is not None:
+            annotate(cache_hits=1)
+            return cached
+
+    scheduler = get_scheduler()
+    reserved = _reserved_tokens(messages, max_tokens)
+    response = scheduler.run(
+        lambda: get_client().chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            timeout=timeout
+        ),
+        tokens=reserved,
+        timing=timing,
+        max_retries=max_retries
+    )
+    content = response.choices[0].message.content
+    usage = getattr(response, "usage", None)
+    scheduler.settle(reserved, getattr(usage, "total_tokens", 0))
+    _annotate_usage(usage, timing)
+
+    if cache and content:
+        cache.put(key, content, getattr(usage, "total_tokens", 0))
+    return content
+
+
+@traced("llm")
+def create_completion(messages, stage=None, temperature=None, max_tokens=None, timing=None):
+    """Chat completion text, served from the response cache when enabled.
+
+    Model, ``max_tokens`` and ``temperature`` come from the ``stage``'s
+    route unless given. API calls go through the request scheduler; if the
+    model still fails after LLM_FALLBACK_RETRIES retries, the route's
+    fallback model answers instead. ``timing`` (if given) receives its
+    ``queue``, ``service``, ``retries`` and the ``model`` that answered.
+    """
+    timing = {} if timing is None else timing
+    route = get_route(stage)
+    temperature = route.temperature if temperature is None else temperature
+    max_tokens = route.max_tokens if max_tokens is None else max_tokens
+
+    models = _models(route)
+    for n, model in enumerate(models):
+        last = n == len(models) - 1
+        timing["model"] = model
+        try:
+            return _complete(
+                model, messages, temperature, max_tokens, route.timeout, timing,
+                None if last else LLM_FALLBACK_RETRIES
+            )
+        except Exception as e:
+            if last:
+                raise
+            logger.warning("%s failed on %s (%s); falling back to %s", stage or "call", model, e, models[n + 1])
+            annotate(fallbacks=1)
+
+
+def _stream(model, messages, temperature, max_tokens, timeout, timing, started, max_retries=None):
+    cache = get_response_cache()
+    if cache:
+        temperature = 0
+        key = response_key(model, messages, temperature, max_tokens)
+        cached = cache.get(key)
+        if cached is not None:
+            timing["ttft"] = timing["total"] = time.perf_counter() - started
+            annotate(cache_hits=1)
+            yield cached
+            return
+
+    # Groq reports streamed usage in ``x_groq``; OpenAI servers on request
+    options = {"stream_options": {"include_usage": True}} if LLM_BACKEND == "openai" else {}
+    scheduler = get_scheduler()
+    reserved = _reserved_tokens(messages, max_tokens)
+    stream = scheduler.stream(
+        lambda: get_client().chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            timeout=timeout,
+            stream=True,
+            **options
+        ),
+        tokens=reserved,
+        timing=timing,
+        max_retries=max_retries
+    )
+    parts = []
+    usage = None
+    for chunk in stream:
+        x_groq = getattr(chunk, "x_groq", None)
+        if getattr(x_groq, "usage", None):
+            usage = x_groq.usage
+        elif getattr(chunk, "usage", None):
+            usage = chunk.usage
+        delta = chunk.choices[0].delta.content if chunk.choices else None
+        if delta:
+            if not parts:
+                timing["ttft"] = time.perf_counter() - started
+            parts.append(delta)
+            yield delta
+    timing["total"] = time.perf_counter() - started
+    scheduler.settle(reserved, getattr(usage, "total_tokens", 0))
+    _annotate_usage(usage, timing)
+
+    if cache and parts:
+        cache.put(key, "".join(parts), getattr(usage, "total_tokens", 0))
+
+
+@traced("llm")
+def stream_completion(messages, stage=None, temperature=None, max_tokens=None, timing=None):
+    """Yield completion text as tokens arrive (``stream=True``).
+
+    Routed like create_completion; the fallback model only takes over if
+    the stream fails before its first token. ``timing`` (if given) receives
+    ``ttft``, the seconds until the first token, and ``total``, plus the
+    scheduler's ``queue``, ``service``, ``retries`` and the ``model``.
+    Cached responses are yielded in one piece.
+    """
+    timing = {} if timing is None else timing
+    started = time.perf_counter()
+    route = get_route(stage)
+    temperature = route.temperature if temperature is None else temperature
+    max_tokens = route.max_tokens if max_tokens is None else max_tokens
+
+    models = _models(route)
+    for n, model in enumerate(models):
+        last = n == len(models) - 1
+        timing["model"] = model
+        streamed = False
+        try:
+            for delta in _stream(
+                model, messages, temperature, max_tokens, route.timeout, timing, started,
+                None if last else LLM_FALLBACK_RETRIES
+            ):
+                streamed = True
+                yield delta
+            return
+        except Exception as e:
+            if last or streamed:
+                raise
+            logger.warning("%s failed on %s (%s); falling back to %s", stage or "call", model, e, models[n + 1])
+            annotate(fallbacks=1)
+
+
+def get_ai_response(system_prompt, user_prompt, max_tokens=None, stage=None):
+    """Single-turn completion routed by ``stage``; logs and returns ``None`` on API errors"""
+    try:
+        return create_completion(
+            [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            stage=stage,
+            max_tokens=max_tokens
+        )
+    except Exception as e:
+        logger.error("API Error: %s", e)
+        return None
+
+
+def get_ai_response_stream(system_prompt, user_prompt, max_tokens=None, timing=None, stage=None):
+    """Streaming get_ai_response; errors propagate to the caller"""
+    yield from stream_completion(
+        [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ],
+        stage=stage,
+        max_tokens=max_tokens,
+        timing=timing
+    )
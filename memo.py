@@ -0,0 +1,32 @@
+import os
+import threading
+from collections import OrderedDict
+
+SUMMARY_MEMO_ENTRIES = int(os.getenv("SUMMARY_MEMO_ENTRIES", "512"))
+
+
+class LRUMemo:
+    """Thread-safe in-memory LRU map, shared by every session in the process"""
+
+    def __init__(self, max_entries=SUMMARY_MEMO_ENTRIES):
+        self.max_entries = max_entries
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._items:
+                return default
+            self._items.move_to_end(key)
+            return self._items[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            return self._items.pop(key, default)
@@ -0,0 +1,78 @@
+import os
+import re
+from collections import Counter
+
+import numpy as np
+
+from chunking import chunk_document
+
+RETRIEVAL_CHUNK_TOKENS = int(os.getenv("RETRIEVAL_CHUNK_TOKENS", "300"))
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "4"))
+
+TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+class BM25Index:
+    """Okapi BM25 over document chunks, stored as a term-major inverted index.
+
+    Postings live in flat NumPy arrays (CSR layout: ``offsets[t]:offsets[t+1]``
+    slices the postings of term ``t``) with the BM25 term-frequency weight
+    precomputed per posting, so a query is a few vectorized scatter-adds.
+    """
+
+    def __init__(self, chunks, k1=1.5, b=0.75):
+        self.chunks = chunks
+        self.vocab = {}
+        term_ids, doc_ids, tfs = [], [], []
+        lengths = np.zeros(len(chunks), dtype=np.float32)
+
+        for doc_id, chunk in enumerate(chunks):
+            counts = Counter(tokenize(chunk.text))
+            lengths[doc_id] = sum(counts.values())
+            for term, tf in counts.items():
+                term_ids.append(self.vocab.setdefault(term, len(self.vocab)))
+                doc_ids.append(doc_id)
+                tfs.append(tf)
+
+        term_ids = np.asarray(term_ids, dtype=np.int64)
+        order = np.argsort(term_ids, kind="stable")
+        self.doc_ids = np.asarray(doc_ids, dtype=np.int32)[order]
+        tf = np.asarray(tfs, dtype=np.float32)[order]
+
+        df = np.bincount(term_ids, minlength=len(self.vocab))
+        self.offsets = np.concatenate(([0], np.cumsum(df)))
+        n_docs = max(len(chunks), 1)
+        self.idf = np.log1p((n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+
+        avg_len = lengths.mean() if len(chunks) else 1.0
+        norm = k1 * (1 - b + b * lengths[self.doc_ids] / max(avg_len, 1.0))
+        self.weights = tf * (k1 + 1) / (tf + norm)
+
+    def search(self, query, k=None):
+        """Top-``k`` chunks for ``query`` as ``(chunk, score)``, best first"""
+        k = RETRIEVAL_TOP_K if k is None else k
+        scores = np.zeros(len(self.chunks), dtype=np.float32)
+        for term in set(tokenize(query)):
+            term_id = self.vocab.get(term)
+            if term_id is None:
+                continue
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            # A term has at most one posting per chunk, so fancy-index += is safe
+            scores[self.doc_ids[start:end]] += self.idf[term_id] * self.weights[start:end]
+
+        k = min(k, len(self.chunks))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.chunks[i], float(scores[i])) for i in top if scores[i] > 0]
+
+
+def build_index(text, max_tokens=None):
+    """Chunk ``text`` for retrieval and index it"""
+    max_tokens = RETRIEVAL_CHUNK_TOKENS if max_tokens is None else max_tokens
+    return BM25Index(chunk_document(text, max_tokens))
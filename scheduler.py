@@ -0,0 +1,249 @@
+import email.utils
+import os
+import random
+import threading
+import time
+from collections import deque
+
+import httpx
+
+# Account-wide Groq limits (set to your tier); 0 disables a limit
+LLM_RPM = float(os.getenv("LLM_RPM", "30"))
+LLM_TPM = float(os.getenv("LLM_TPM", "12000"))
+# Adaptive concurrency: halved on every 429, grows back by ~1 per round of successes
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+LLM_MIN_CONCURRENCY = int(os.getenv("LLM_MIN_CONCURRENCY", "1"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "1"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "60"))
+
+RETRYABLE_STATUS = {408, 409, 429}
+
+
+def _status(error):
+    return getattr(error, "status_code", None)
+
+
+def retry_after(error):
+    """Seconds the server asked us to wait (``Retry-After``), or ``None``"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(error):
+    status = _status(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS or status >= 500
+    # APIConnectionError / APITimeoutError of either SDK (Groq or OpenAI)
+    if any(cls.__name__ == "APIConnectionError" for cls in type(error).__mro__):
+        return True
+    return isinstance(error, httpx.TransportError)
+
+
+class RequestScheduler:
+    """Admission control for every LLM request in the process.
+
+    A request waits until a concurrency slot is free and both token buckets
+    (requests and tokens per minute, each refilling continuously with a
+    one-minute burst) can cover it. 429s and transient errors are retried
+    with exponential backoff and full jitter, never sooner than the
+    server's ``Retry-After``, and a 429 also pauses admission for everyone
+    and halves the concurrency limit (AIMD). Each call records its queue
+    wait (including backoff) separately from its service time.
+    """
+
+    def __init__(
+        self,
+        rpm=LLM_RPM,
+        tpm=LLM_TPM,
+        max_concurrency=LLM_MAX_CONCURRENCY,
+        min_concurrency=LLM_MIN_CONCURRENCY,
+        max_retries=LLM_MAX_RETRIES,
+        backoff_base=LLM_BACKOFF_BASE,
+        backoff_max=LLM_BACKOFF_MAX,
+    ):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self.limit = float(self.max_concurrency)
+        self.in_flight = 0
+        self._requests = rpm
+        self._tokens = tpm
+        self._refilled = time.monotonic()
+        self._paused_until = 0.0
+        self._cond = threading.Condition()
+
+        self.calls = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.errors = 0
+        self._samples = deque(maxlen=1000)
+
+    def _refill(self, now):
+        elapsed = now - self._refilled
+        self._refilled = now
+        if self.rpm:
+            self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60)
+        if self.tpm:
+            self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60)
+
+    def _acquire(self, tokens):
+        """Block until the request may start; returns the seconds waited"""
+        started = time.monotonic()
+        # A request bigger than the bucket runs once the bucket is full
+        tokens = min(tokens, self.tpm) if self.tpm else 0
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                waits = []
+                if now < self._paused_until:
+                    waits.append(self._paused_until - now)
+                if self.rpm and self._requests < 1:
+                    waits.append((1 - self._requests) * 60 / self.rpm)
+                if tokens and self._tokens < tokens:
+                    waits.append((tokens - self._tokens) * 60 / self.tpm)
+                if not waits and self.in_flight < int(self.limit):
+                    break
+                # Woken early by releases; otherwise when the buckets have refilled
+                self._cond.wait(max(waits) if waits else None)
+
+            self.in_flight += 1
+            if self.rpm:
+                self._requests -= 1
+            self._tokens -= tokens
+        return time.monotonic() - started
+
+    def _release(self, error=None):
+        with self._cond:
+            self.in_flight -= 1
+            if error is None:
+                # Additive increase: +1 slot per ``limit`` successful calls
+                self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            elif _status(error) == 429:
+                self.limit = max(self.min_concurrency, self.limit / 2)
+                pause = retry_after(error)
+                if pause:
+                    self._paused_until = max(self._paused_until, time.monotonic() + pause)
+            self._cond.notify_all()
+
+    def settle(self, reserved, used):
+        """Return unused reserved tokens (or charge the overrun) once usage is known"""
+        if not self.tpm or not used:
+            return
+        with self._cond:
+            self._tokens = min(self.tpm, self._tokens + min(reserved, self.tpm) - used)
+            self._cond.notify_all()
+
+    def _backoff(self, error, attempt):
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        server = retry_after(error)
+        return max(delay, server) if server is not None else delay
+
+    def _record(self, queued, service, retries, outcome):
+        with self._cond:
+            self.calls += 1
+            self.retries += retries
+            if outcome != "ok":
+                self.errors += 1
+            self._samples.append((queued, service))
+
+    def _start(self, call, tokens, max_retries=None):
+        """Run ``call`` under the limits, retrying; the slot stays held on success"""
+        max_retries = self.max_retries if max_retries is None else max_retries
+        queued = 0.0
+        attempt = 0
+        while True:
+            queued += self._acquire(tokens)
+            started = time.monotonic()
+            try:
+                return call(), queued, started, attempt
+            except Exception as e:
+                self._release(e)
+                if _status(e) == 429:
+                    with self._cond:
+                        self.rate_limited += 1
+                if attempt >= max_retries or not is_retryable(e):
+                    self._record(queued, time.monotonic() - started, attempt, "error")
+                    raise
+                delay = self._backoff(e, attempt)
+                time.sleep(delay)
+                queued += delay
+                attempt += 1
+
+    def run(self, call, tokens=0, timing=None, max_retries=None):
+        """Result of ``call()``, run once admitted and retried as needed.
+
+        ``tokens`` is the request's estimated size for the tokens-per-minute
+        bucket. ``timing`` (if given) receives ``queue`` and ``service``
+        seconds and the number of ``retries``. ``max_retries`` overrides the
+        scheduler's, e.g. to give up early when there is a fallback.
+        """
+        result, queued, started, retries = self._start(call, tokens, max_retries)
+        service = time.monotonic() - started
+        self._release()
+        self._record(queued, service, retries, "ok")
+        if timing is not None:
+            timing.update(queue=queued, service=service, retries=retries)
+        return result
+
+    def stream(self, call, tokens=0, timing=None, max_retries=None):
+        """Like run, for a call returning an iterable: yields its items and
+        holds the concurrency slot until the stream is consumed or closed.
+
+        Only opening the stream is retried; an error midway propagates.
+        """
+        stream, queued, started, retries = self._start(call, tokens, max_retries)
+        error = None
+        try:
+            yield from stream
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            service = time.monotonic() - started
+            self._release(error)
+            self._record(queued, service, retries, "error" if error else "ok")
+            if timing is not None:
+                timing.update(queue=queued, service=service, retries=retries)
+
+    def stats(self):
+        with self._cond:
+            samples = list(self._samples)
+            stats = {
+                "calls": self.calls,
+                "retries": self.retries,
+                "rate_limited": self.rate_limited,
+                "errors": self.errors,
+                "in_flight": self.in_flight,
+                "concurrency_limit": int(self.limit),
+            }
+        for i, name in enumerate(("queue", "service")):
+            values = sorted(s[i] for s in samples)
+            stats[f"{name}_p50"] = values[len(values) // 2] if values else 0.0
+            stats[f"{name}_p95"] = values[min(len(values) - 1, int(len(values) * 0.95))] if values else 0.0
+        return stats
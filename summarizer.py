@@ -0,0 +1,499 @@
+import functools
+import importlib.util
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+
+from chunking import chunk_document, estimate_tokens, iter_page_chunks
+from extractive import ChunkCondenser, condense_chunks
+from extraction import (
+    OCR_AVAILABLE, OCR_DPI, OCR_GRAYSCALE, OCR_MIN_CHARS, SpooledPDF, iter_pages, iter_pages_ocr
+)
+from extraction_cache import ExtractionCache, cache_key
+from jobs import advance, report
+from llm import get_ai_response, get_ai_response_stream
+from memo import LRUMemo
+from tracing import annotate, propagate, span, traced
+
+# Optional imports, loaded only when their extraction path runs
+PDFPLUMBER_AVAILABLE = importlib.util.find_spec("pdfplumber") is not None
+
+# Concurrent LLM calls during the map phase (match your Groq rate-limit tier)
+MAP_CONCURRENCY = int(os.getenv("MAP_CONCURRENCY", "4"))
+# Hierarchical reduce: summaries per group, and the size that fits one final prompt
+REDUCE_FAN_IN = int(os.getenv("REDUCE_FAN_IN", "8"))
+REDUCE_MAX_CHARS = int(os.getenv("REDUCE_MAX_CHARS", "12000"))
+# Documents up to this size can get summary, key points and mind map in one call
+COMBINED_MAX_TOKENS = int(os.getenv("COMBINED_MAX_TOKENS", "3000"))
+
+
+@functools.lru_cache(maxsize=None)
+def get_extraction_cache():
+    return ExtractionCache()
+
+
+@functools.lru_cache(maxsize=None)
+def get_summary_memo():
+    """Intermediate summary results by document hash, shared across sessions"""
+    return LRUMemo()
+
+
+def _extraction_key(content_sha256, use_ocr):
+    use_ocr = bool(use_ocr and OCR_AVAILABLE)
+    return cache_key(
+        content_sha256,
+        use_ocr=use_ocr,
+        ocr_settings=[OCR_DPI, OCR_GRAYSCALE, OCR_MIN_CHARS] if use_ocr else None,
+        pdfplumber=PDFPLUMBER_AVAILABLE,
+    )
+
+
+def _fallback_pages(pdf):
+    """pdfplumber, for PDFs where PyPDF2 found no text"""
+    if PDFPLUMBER_AVAILABLE:
+        try:
+            import pdfplumber
+            with pdfplumber.open(pdf.open()) as document:
+                return [page.extract_text() or "" for page in document.pages]
+        except:
+            pass
+    return []
+
+
+def stream_pdf_pages(pdf_file, use_ocr=False, info=None):
+    """Yield page texts as they are extracted.
+
+    Cached documents are replayed from the extraction cache. ``info`` (if
+    given) receives ``page_count`` and ``cache_hit`` once the generator is
+    exhausted.
+    """
+    info = {} if info is None else info
+
+    # Spool to disk once; every backend reads the same memory mapping
+    with SpooledPDF(pdf_file) as pdf:
+        cache = get_extraction_cache()
+        key = _extraction_key(pdf.sha256, use_ocr)
+        cached = cache.get(key)
+        if cached:
+            annotate(cache_hits=1)
+            info.update(page_count=cached["page_count"], cache_hit=True)
+            report(pages=cached["page_count"])
+            yield from cached["pages"]
+            return
+
+        # Try PyPDF2 (large documents are split across a process pool)
+        page_iter = iter_pages(pdf)
+        backend = "pypdf2"
+
+        # OCR pages with little or no embedded text, one page at a time
+        if use_ocr and OCR_AVAILABLE:
+            page_iter = iter_pages_ocr(pdf, page_iter)
+            backend = "pypdf2+ocr"
+
+        pages = []
+        for page in page_iter:
+            pages.append(page)
+            report(pages=len(pages))
+            yield page
+        info.update(page_count=len(pages), cache_hit=False)
+
+        # Try pdfplumber if no text: nothing worth chunking has been yielded yet
+        if not any(p.strip() for p in pages):
+            fallback = _fallback_pages(pdf)
+            if any(p.strip() for p in fallback):
+                pages, backend = fallback, "pdfplumber"
+                yield from pages
+
+    if any(p.strip() for p in pages):
+        cache.put(key, pages, info["page_count"], backend)
+
+
+@traced("extract")
+def extract_text_from_pdf(pdf_file, use_ocr=False):
+    """Extract text from PDF with multiple methods.
+
+    Returns ``(text, page_count, cache_hit)``; results are cached on disk by
+    content hash so re-uploads of the same bytes skip extraction.
+    """
+    try:
+        info = {}
+        pages = list(stream_pdf_pages(pdf_file, use_ocr, info))
+        text = "\n".join(p for p in pages if p.strip())
+        return text.strip(), info["page_count"], info["cache_hit"]
+    except Exception as e:
+        raise ValueError(f"Error reading PDF: {str(e)}")
+
+
+@traced("chunk")
+def chunk_text(text, max_tokens=None):
+    """Token-budgeted chunks of ``text`` (see chunking.iter_page_chunks)"""
+    return [chunk.text for chunk in chunk_document(text, max_tokens)]
+
+
+LANGUAGE_MAP = {
+    "spanish": "Spanish", "chinese": "Chinese (Simplified)", "hindi": "Hindi",
+    "french": "French", "german": "German", "japanese": "Japanese",
+    "korean": "Korean", "arabic": "Arabic", "urdu": "Urdu", "portuguese": "Portuguese"
+}
+
+
+def _in_language(language):
+    """Prompt suffix asking for output in ``language`` (nothing for English)"""
+    if language == "english":
+        return ""
+    return f", written in {LANGUAGE_MAP.get(language, language)}"
+
+
+def _translation_prompts(text, target_language):
+    system_prompt = f"You are a professional translator. Translate to {LANGUAGE_MAP.get(target_language, target_language)}."
+    return system_prompt, f"Translate:\n\n{text}"
+
+
+@traced("translate")
+def translate_text(text, target_language):
+    if target_language == "english":
+        return text
+    return get_ai_response(*_translation_prompts(text, target_language), stage="translate")
+
+
+@traced("translate")
+def translate_text_stream(text, target_language, timing=None):
+    if target_language == "english":
+        yield text
+        return
+    yield from get_ai_response_stream(*_translation_prompts(text, target_language), timing=timing, stage="translate")
+
+
+def _parse_key_points(value):
+    """Numbered-list text from a JSON list of points (or text as is)"""
+    if isinstance(value, list):
+        return "\n".join(f"{i}. {point}" for i, point in enumerate(value, 1))
+    return value
+
+
+@traced("translate")
+def translate_artifacts(language, summary=None, key_points=None, mindmap=None):
+    """Translate summary, key points and mind-map labels in one structured call.
+
+    Only the artifacts given are sent. Returns a dict with the same keys, or
+    ``None`` if the response is unusable (then translate one by one).
+    """
+    payload = {}
+    if summary:
+        payload["summary"] = summary
+    if key_points:
+        payload["key_points"] = key_points
+    if mindmap:
+        payload["mindmap"] = mindmap
+    if not payload or language == "english":
+        return payload
+
+    text = json.dumps(payload, ensure_ascii=False)
+    system_prompt = (
+        f"You are a professional translator. Translate every string value of the JSON object to "
+        f"{LANGUAGE_MAP.get(language, language)}. Keep the keys, structure and line breaks unchanged. "
+        f"Reply with the JSON object only."
+    )
+    # Non-Latin scripts can take several times the tokens of the English source
+    response = get_ai_response(
+        system_prompt, text, max_tokens=min(8000, 3 * estimate_tokens(text) + 200), stage="translate"
+    )
+    if not response:
+        return None
+
+    try:
+        data = _parse_json(response)
+        result = {}
+        if "summary" in payload:
+            result["summary"] = str(data["summary"]).strip()
+        if "key_points" in payload:
+            result["key_points"] = _parse_key_points(data["key_points"])
+        if "mindmap" in payload:
+            if not isinstance(data["mindmap"], dict) or "branches" not in data["mindmap"]:
+                return None
+            result["mindmap"] = data["mindmap"]
+    except (ValueError, KeyError, TypeError):
+        return None
+    return result if all(result.values()) else None
+
+
+LENGTH_MAP = {
+    "short": "in 3–5 concise sentences",
+    "medium": "in 2–3 clear paragraphs",
+    "detailed": "in 4–5 detailed paragraphs with key insights"
+}
+
+AUDIENCE_MAP = {
+    "general": "for a general audience using clear language",
+    "ceo": "for executives focusing on strategic insights",
+    "lawyer": "for legal professionals highlighting clauses and risks",
+    "researcher": "for researchers emphasizing methodology and findings",
+    "student": "for students using simple, educational language"
+}
+
+
+def _summary_prompts(text, audience, length, language="english"):
+    system_prompt = "You are an expert document analyst. Create comprehensive summaries."
+    user_prompt = f"Summarize this document {LENGTH_MAP[length]} {AUDIENCE_MAP[audience]}{_in_language(language)}:\n\n{text}"
+    return system_prompt, user_prompt
+
+
+def summarize_text(text, audience="general", length="medium", language="english", stage="summary"):
+    """Summary of ``text``, written directly in ``language`` (one call, no
+    translation pass); ``stage`` picks the model route (map, reduce or summary)"""
+    return get_ai_response(*_summary_prompts(text, audience, length, language), stage=stage)
+
+
+@traced("summary")
+def summarize_text_stream(text, audience="general", length="medium", timing=None, language="english"):
+    """Streaming summarize_text"""
+    yield from get_ai_response_stream(
+        *_summary_prompts(text, audience, length, language), timing=timing, stage="summary"
+    )
+
+
+def summarize_chunk(chunk, audience="general", retries=1, stage="map"):
+    """Map step: short English summary of one chunk, retried on its own if it fails"""
+    try:
+        for _ in range(retries + 1):
+            try:
+                summary = summarize_text(chunk, audience, "short", "english", stage)
+            except Exception:
+                summary = None
+            if summary:
+                return summary
+        return None
+    finally:
+        advance(chunks_done=1)
+
+
+def summarize_chunks(chunks, audience="general", max_workers=None, stage="map"):
+    """Map phase with bounded concurrency; results are in chunk order.
+
+    Chunks that still fail after retrying come back as ``None``.
+    """
+    advance(chunks_total=len(chunks))
+    with ThreadPoolExecutor(max_workers=max_workers or MAP_CONCURRENCY) as pool:
+        return list(pool.map(propagate(lambda chunk: summarize_chunk(chunk, audience, stage=stage)), chunks))
+
+
+@traced("reduce")
+def reduce_summaries(summaries, audience="general", fan_in=None, max_chars=None, tree=None):
+    """Tree-reduce partial summaries until they fit into one prompt.
+
+    Each level groups ``fan_in`` summaries and summarizes every group again
+    (concurrently), so the number of levels grows with the log of the input.
+    ``tree`` (if given) has its ``depth`` and ``calls`` counters updated.
+    Returns the combined text for the final summary, or ``None``.
+    """
+    fan_in = max(2, fan_in or REDUCE_FAN_IN)
+    max_chars = max_chars or REDUCE_MAX_CHARS
+    tree = {"depth": 0, "calls": 0} if tree is None else tree
+
+    level = [s for s in summaries if s]
+    while len(level) > 1 and sum(len(s) + 1 for s in level) > max_chars:
+        groups = [" ".join(level[i:i + fan_in]) for i in range(0, len(level), fan_in)]
+        reduced = summarize_chunks(groups, audience, stage="reduce")
+        tree["depth"] += 1
+        tree["calls"] += len(groups)
+        level = [s for s in reduced if s]
+
+    return " ".join(level) if level else None
+
+
+def reduce_document(text, audience="general", partial_summaries=None):
+    """Map and reduce a whole document, with no cap on its length.
+
+    ``partial_summaries`` lets the streaming pipeline hand over a map phase it
+    already ran. Returns ``(summary_input, tree)``: the text the final summary
+    should be written from (``None`` if every call failed), and a record of
+    the ``depth`` of the call tree, total LLM ``calls`` including the final
+    one, ``chunks`` and ``failed`` map chunks, and the token counts of the
+    ``extractive`` pre-summarization if the map phase ran here.
+    """
+    extractive = {}
+    if partial_summaries is None:
+        chunks = chunk_text(text)
+        with span("map"):
+            if len(chunks) > 1:
+                # Only the most central sentences go to the LLM, repacked into fewer chunks
+                with span("extractive"):
+                    chunks = condense_chunks(chunks, stats=extractive) or chunks
+                partial_summaries = summarize_chunks(chunks, audience)
+            else:
+                partial_summaries = []
+
+    tree = {"depth": 1, "calls": 1, "chunks": max(1, len(partial_summaries)), "failed": 0}
+    if extractive:
+        tree["extractive"] = extractive
+    if not partial_summaries:
+        return text, tree
+
+    tree["depth"] += 1
+    tree["calls"] += len(partial_summaries)
+    tree["failed"] = sum(1 for p in partial_summaries if not p)
+
+    return reduce_summaries(partial_summaries, audience, tree=tree), tree
+
+
+def summarize_document(text, audience="general", length="medium", language="english", partial_summaries=None):
+    """Map-reduce summary of a whole document; returns ``(summary, tree)``"""
+    summary_input, tree = reduce_document(text, audience, partial_summaries)
+    if not summary_input:
+        return None, tree
+    with span("summary"):
+        return summarize_text(summary_input, audience, length, language), tree
+
+
+@traced("key_points")
+def extract_key_points(text, num_points=7, language="english"):
+    system_prompt = "You are an expert at identifying critical insights."
+    user_prompt = f"Extract {num_points} key points as a numbered list{_in_language(language)}:\n\n{text[:5000]}"
+    return get_ai_response(system_prompt, user_prompt, stage="key_points")
+
+
+@traced("mindmap")
+def generate_mindmap_data(text, language="english"):
+    system_prompt = "Create structured mind maps from documents."
+    user_prompt = f"""Create a mind map in JSON{_in_language(language)}:
+    {{"central": "Main Topic", "branches": [{{"name": "Branch", "subbranches": ["Detail"]}}]}}
+
+    Document: {text[:3000]}"""
+
+    response = get_ai_response(system_prompt, user_prompt, stage="mindmap")
+    if not response:
+        return None
+
+    try:
+        return _parse_json(response)
+    except:
+        return {
+            "central": "Document Analysis",
+            "branches": [{"name": "Main Points", "subbranches": ["Point 1", "Point 2"]}]
+        }
+
+
+def _parse_json(response):
+    """JSON object from a model response, with any Markdown code fence removed"""
+    response = response.strip()
+    if "```json" in response:
+        response = response.split("```json")[1].split("```")[0]
+    elif "```" in response:
+        response = response.split("```")[1].split("```")[0]
+    return json.loads(response)
+
+
+def can_combine(text):
+    return estimate_tokens(text) <= COMBINED_MAX_TOKENS
+
+
+@traced("combined")
+def generate_combined(text, audience="general", length="medium", key_points=True, mindmap=True, num_points=7,
+                      language="english"):
+    """Summary, key points and mind map from a single structured-JSON call.
+
+    Meant for short documents (see ``can_combine``). All text is written in
+    ``language``, keys stay English. Returns a dict with
+    ``summary`` and the requested ``key_points`` (numbered-list text, as
+    extract_key_points returns) and ``mindmap``, or ``None`` if the response
+    is unusable and the caller should fall back to separate calls.
+    """
+    fields = [f'"summary": "<summary {LENGTH_MAP[length]} {AUDIENCE_MAP[audience]}>"']
+    if key_points:
+        fields.append(f'"key_points": ["<{num_points} key points, one per item>"]')
+    if mindmap:
+        fields.append('"mindmap": {"central": "Main Topic", "branches": [{"name": "Branch", "subbranches": ["Detail"]}]}')
+
+    system_prompt = "You are an expert document analyst. Reply with a single JSON object and nothing else."
+    user_prompt = f"""Analyze this document and reply in JSON{_in_language(language)}:
+    {{{", ".join(fields)}}}
+
+    Document: {text}"""
+
+    response = get_ai_response(system_prompt, user_prompt, stage="combined")
+    if not response:
+        return None
+
+    try:
+        data = _parse_json(response)
+        result = {"summary": str(data["summary"]).strip()}
+        if key_points:
+            result["key_points"] = _parse_key_points(data["key_points"])
+        if mindmap:
+            if not isinstance(data["mindmap"], dict):
+                return None
+            result["mindmap"] = data["mindmap"]
+    except (ValueError, KeyError, TypeError):
+        return None
+    return result if result["summary"] else None
+
+
+@traced("extract_map")
+def summarize_pdf_streaming(pdf_file, use_ocr, audience, stats=None, on_text=None):
+    """Extract, chunk and map-summarize in a single pass.
+
+    Pages flow from the extractor into the chunker, and chunks into the
+    extractive condenser; each packed chunk is handed to the map stage
+    immediately, so LLM latency overlaps extraction. Returns ``(text,
+    page_count, cache_hit, partial_summaries)``; the partial summaries list
+    is empty when the document fits in a single chunk, and holds ``None``
+    for chunks that failed. ``stats`` (a dict) gets the condenser's token
+    counts. ``on_text`` is called with the full text as soon as extraction
+    ends, while the map calls are still running.
+    """
+    info = {}
+    page_texts = []
+
+    def pages():
+        for page in stream_pdf_pages(pdf_file, use_ocr, info):
+            if page.strip():
+                page_texts.append(page)
+            yield page
+
+    futures = []
+    first_chunk = None
+    condenser = ChunkCondenser()
+    with ThreadPoolExecutor(max_workers=MAP_CONCURRENCY) as pool, ExitStack() as map_stage:
+
+        def submit(texts):
+            if texts and not futures:
+                # Opened with the first map call and closed once all are collected;
+                # the calls' tokens and queue time are annotated on it
+                map_stage.enter_context(span("map"))
+            for text in texts:
+                advance(chunks_total=1)
+                futures.append(pool.submit(propagate(summarize_chunk), text, audience))
+
+        def condense(chunk_text=None):
+            with span("extractive"):
+                packed = condenser.add(chunk_text) if chunk_text is not None else condenser.flush()
+            submit(packed)
+
+        try:
+            for chunk in iter_page_chunks(pages()):
+                # Hold the first chunk back: single-chunk documents skip the map stage
+                if first_chunk is None:
+                    first_chunk = chunk
+                    continue
+                if not condenser.tokens_in:
+                    condense(first_chunk.text)
+                condense(chunk.text)
+            if condenser.tokens_in:
+                condense()
+        except Exception as e:
+            for future in futures:
+                future.cancel()
+            raise ValueError(f"Error reading PDF: {str(e)}")
+
+        text = "\n".join(page_texts).strip()
+        if condenser.tokens_in and not condenser.tokens_out:
+            # Never let a multi-chunk document reach the final summary as one prompt
+            submit(chunk_text(text))
+        if on_text is not None and text:
+            on_text(text)
+        partial_summaries = [future.result() for future in futures]
+
+    if stats is not None and condenser.tokens_in:
+        stats.update(condenser.stats())
+    return text, info["page_count"], info["cache_hit"], partial_summaries
@@ -0,0 +1,13 @@
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Settings are read on import: no request limits, response cache or metrics
+# file, and a throwaway extraction cache, whatever the shell has set
+os.environ.update(
+    LLM_RPM="0", LLM_TPM="0", LLM_CACHE="0", METRICS_FILE="", TRACE_LOG="0",
+    EXTRACTION_CACHE_DIR=tempfile.mkdtemp(prefix="pdf-summarizer-tests-"),
+)
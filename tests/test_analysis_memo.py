@@ -0,0 +1,117 @@
+import hashlib
+import io
+
+import pytest
+
+import analysis
+import summarizer
+
+PAGE = "The supplier delivers {n} units each month under clause {n}, and payment is due within thirty days. "
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    """_analyze with extraction and every LLM call stubbed; returns the result
+    and the stages that called the LLM"""
+    summarizer.get_summary_memo.cache_clear()
+    # OCR changes the extraction key only where it is installed
+    monkeypatch.setattr(summarizer, "OCR_AVAILABLE", True)
+    calls = []
+
+    def get_ai_response(system_prompt, user_prompt, max_tokens=None, stage=None):
+        calls.append(stage)
+        return f"{stage} of {hashlib.sha256(user_prompt.encode()).hexdigest()[:8]}"
+
+    def extract_text_from_pdf(pdf_file, use_ocr=False):
+        source = "scanned" if use_ocr else "embedded"
+        return " ".join(PAGE.format(n=n) + source for n in range(300)), 30, False
+
+    monkeypatch.setattr(summarizer, "get_ai_response", get_ai_response)
+    monkeypatch.setattr(analysis, "extract_text_from_pdf", extract_text_from_pdf)
+
+    def run(**changes):
+        options = {
+            "ocr": False, "audience": "general", "length": "medium", "language": "english",
+            "key_points": False, "mindmap": False, "combined": False, "direct": False, "stream": False,
+        }
+        options.update(changes)
+        calls.clear()
+        result = analysis._analyze(io.BytesIO(b"%PDF"), "doc-hash", "doc.pdf", options)
+        return result, sorted(set(calls))
+
+    yield run
+    summarizer.get_summary_memo.cache_clear()
+
+
+def test_first_run_reuses_nothing(pipeline):
+    result, stages = pipeline()
+    assert result["metadata"]["reused"] == []
+    assert stages == ["map", "summary"]
+    assert result["metadata"]["summary_tree"]["chunks"] > 1
+
+
+def test_rerun_reuses_everything(pipeline):
+    first, _ = pipeline()
+    result, stages = pipeline()
+    assert result["metadata"]["reused"] == ["reduce", "summary"]
+    assert stages == []
+    assert result["summary"] == first["summary"]
+
+
+def test_length_change_costs_only_the_final_summary(pipeline):
+    first, _ = pipeline()
+    result, stages = pipeline(length="short")
+    assert result["metadata"]["reused"] == ["reduce"]
+    assert stages == ["summary"]
+    assert result["summary"] != first["summary"]
+
+
+def test_language_change_translates_the_english_summary(pipeline):
+    pipeline()
+    result, stages = pipeline(language="french")
+    assert result["metadata"]["reused"] == ["reduce", "summary"]
+    assert stages == ["translate"]
+
+    _, stages = pipeline(language="french")
+    assert stages == []
+
+
+def test_direct_and_translated_results_are_kept_apart(pipeline):
+    pipeline()
+    translated, _ = pipeline(language="french")
+
+    direct, stages = pipeline(language="french", direct=True)
+    assert direct["metadata"]["reused"] == ["reduce"]
+    assert stages == ["summary"]
+    assert direct["summary"] != translated["summary"]
+
+    again, stages = pipeline(language="french", direct=True)
+    assert again["metadata"]["reused"] == ["reduce", "direct summary"]
+    assert stages == []
+    assert again["summary"] == direct["summary"]
+
+    result, stages = pipeline(language="french")
+    assert result["metadata"]["reused"] == ["reduce", "summary", "translation"]
+    assert result["summary"] == translated["summary"]
+
+
+def test_ocr_toggle_reuses_nothing(pipeline):
+    embedded, _ = pipeline()
+    scanned, stages = pipeline(ocr=True)
+    assert scanned["metadata"]["reused"] == []
+    assert "map" in stages and "summary" in stages
+    assert scanned["summary"] != embedded["summary"]
+
+    # Both texts stay memoized side by side
+    _, stages = pipeline()
+    assert stages == []
+    _, stages = pipeline(ocr=True)
+    assert stages == []
+
+
+def test_extraction_key_includes_ocr(monkeypatch):
+    monkeypatch.setattr(summarizer, "OCR_AVAILABLE", True)
+    assert summarizer._extraction_key("doc-hash", False) != summarizer._extraction_key("doc-hash", True)
+    monkeypatch.setattr(summarizer, "OCR_AVAILABLE", False)
+    # Without OCR installed both options extract the same text
+    assert summarizer._extraction_key("doc-hash", False) == summarizer._extraction_key("doc-hash", True)
@@ -0,0 +1,112 @@
+import random
+
+import pytest
+
+from chunking import CHARS_PER_TOKEN, chunk_document, estimate_tokens, iter_page_chunks
+
+WORDS = "contract supplier payment delivery clause liability invoice schedule term notice".split()
+
+
+def random_pages(seed, count=40):
+    """Pages of paragraphs, lines and sentences, with empty and blank pages mixed in"""
+    rng = random.Random(seed)
+    pages = []
+    for _ in range(count):
+        if rng.random() < 0.15:
+            pages.append(rng.choice(["", "   ", "\n\n"]))
+            continue
+        paragraphs = []
+        for _ in range(rng.randint(1, 6)):
+            lines = [
+                " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 40))).capitalize()
+                + rng.choice([".", "!", "?", ""])
+                for _ in range(rng.randint(1, 8))
+            ]
+            paragraphs.append("\n".join(lines))
+        pages.append(rng.choice(["", "  ", "\n"]) + "\n\n".join(paragraphs) + rng.choice(["", " ", "\n"]))
+    return pages
+
+
+def document(pages):
+    """The text the app builds from the same pages"""
+    return "\n".join(page for page in pages if page.strip()).strip()
+
+
+def check_chunks(text, chunks, max_tokens, overlap_tokens):
+    assert chunks
+    for chunk in chunks:
+        assert text[chunk.start:chunk.end] == chunk.text
+        assert estimate_tokens(chunk.text) <= max_tokens
+    for prev, chunk in zip(chunks, chunks[1:]):
+        assert chunk.start > prev.start
+        assert prev.end - chunk.start <= overlap_tokens * CHARS_PER_TOKEN
+    # Nothing is lost between chunks
+    covered = bytearray(len(text))
+    for chunk in chunks:
+        covered[chunk.start:chunk.end] = b"\x01" * (chunk.end - chunk.start)
+    assert all(covered[i] or text[i].isspace() for i in range(len(text)))
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("max_tokens, overlap_tokens", [(50, 10), (200, 50), (1000, 0)])
+def test_page_chunks_slice_the_document(seed, max_tokens, overlap_tokens):
+    pages = random_pages(seed)
+    text = document(pages)
+    chunks = list(iter_page_chunks(pages, max_tokens, overlap_tokens))
+    check_chunks(text, chunks, max_tokens, overlap_tokens)
+    overlapping = any(prev.end > chunk.start for prev, chunk in zip(chunks, chunks[1:]))
+    assert overlapping == bool(overlap_tokens)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_document_chunks_keep_leading_whitespace_offsets(seed):
+    text = "\n\n  " + "\n\n".join(p for p in random_pages(seed) if p.strip()) + "\n"
+    chunks = chunk_document(text, 100, 20)
+    check_chunks(text, chunks, 100, 20)
+
+
+def test_page_numbers_count_empty_pages():
+    pages = ["alpha " * 30, "", "   \n", "beta " * 30, "gamma " * 30, "", "delta " * 30]
+    chunks = list(iter_page_chunks(pages, max_tokens=50, overlap_tokens=0))
+    first_page = {chunk.text.split()[0]: chunk.page_start for chunk in chunks}
+    assert first_page == {"alpha": 1, "beta": 4, "gamma": 5, "delta": 7}
+    assert all(chunk.page_start == chunk.page_end for chunk in chunks)
+
+
+def test_chunk_spanning_pages_reports_both():
+    pages = ["alpha " * 10, "", "beta " * 10]
+    chunks = list(iter_page_chunks(pages, max_tokens=1000))
+    assert len(chunks) == 1
+    assert (chunks[0].page_start, chunks[0].page_end) == (1, 3)
+    assert chunks[0].text == document(pages)
+
+
+def test_document_page_numbers_from_offsets():
+    pages = ["alpha " * 30, "beta " * 30, "gamma " * 30]
+    text = "\n".join(pages)
+    offsets = [0, len(pages[0]) + 1, len(pages[0]) + len(pages[1]) + 2]
+    chunks = chunk_document(text, 50, 0, page_offsets=offsets)
+    for chunk in chunks:
+        expected = 1 + sum(chunk.start >= offset for offset in offsets[1:])
+        assert chunk.page_start == expected
+
+
+def test_unpunctuated_text_splits_at_words():
+    rng = random.Random(0)
+    text = " ".join(rng.choice(WORDS) for _ in range(3000))
+    chunks = chunk_document(text, 40, 5)
+    check_chunks(text, chunks, 40, 5)
+    assert len(chunks) > 10
+    assert all(word in WORDS for chunk in chunks for word in chunk.text.split())
+
+
+def test_unbroken_text_is_hard_split():
+    text = "x" * 10_000
+    chunks = chunk_document(text, 100, 10)
+    check_chunks(text, chunks, 100, 10)
+    assert max(len(chunk.text) for chunk in chunks) == 100 * CHARS_PER_TOKEN
+
+
+def test_empty_input():
+    assert list(iter_page_chunks(["", "  ", "\n"])) == []
+    assert chunk_document("   ") == []
@@ -0,0 +1,87 @@
+import io
+
+import pytest
+
+import summarizer
+from chunking import chunk_document, estimate_tokens
+from extractive import EXTRACTIVE_MIN_WORDS, ChunkCondenser, condense, condense_chunks
+from retrieval import tokenize
+
+PROSE = (
+    "The supplier delivers {n} units each month under clause {n} of the agreement. "
+    "Payment for batch {n} is due within thirty days of the invoice date. "
+    "Late deliveries of batch {n} reduce the price by two percent per week. "
+)
+
+
+def table(rows):
+    return "\n".join(f"Item {n} Qty {n * 3} USD {n * 17}" for n in range(rows))
+
+
+def test_short_lines_are_kept():
+    text = "\n".join(f"Item {n} P" for n in range(300))
+    lines = set(text.splitlines())
+    assert all(len(tokenize(line)) < EXTRACTIVE_MIN_WORDS for line in lines)
+    kept = condense(text, 0.35)
+    assert kept
+    assert estimate_tokens(kept) >= 0.35 * estimate_tokens(text) * 0.95
+    assert set(kept.replace(" Item", "\nItem").splitlines()) <= lines
+
+
+def test_chunk_with_nothing_left_to_rank_is_sent_whole():
+    condenser = ChunkCondenser(ratio=0.35, max_tokens=10_000)
+    condenser.add("Item 1 Qty 3 USD 17")
+    # Its only line was already kept from the first chunk
+    condenser.add("Item 1 Qty 3 USD 17")
+    assert condenser.flush() == ["Item 1 Qty 3 USD 17\n\nItem 1 Qty 3 USD 17"]
+    assert condenser.tokens_out == condenser.tokens_in
+
+
+@pytest.mark.parametrize("ratio", [0.2, 0.35, 0.5])
+def test_table_keeps_the_ratio_budget(ratio):
+    chunks = [chunk.text for chunk in chunk_document(table(2000), 500)]
+    stats = {}
+    packed = condense_chunks(chunks, ratio, stats=stats)
+    assert len(chunks) > 1 and packed
+    assert stats["tokens_out"] >= ratio * stats["tokens_in"] * 0.95
+    assert sum(estimate_tokens(text) for text in packed) >= ratio * stats["tokens_in"] * 0.95
+
+
+def test_prose_is_condensed_to_about_the_ratio():
+    chunks = [chunk.text for chunk in chunk_document(" ".join(PROSE.format(n=n) for n in range(300)), 500)]
+    stats = {}
+    packed = condense_chunks(chunks, 0.35, stats=stats)
+    assert len(packed) < len(chunks)
+    assert 0.3 <= stats["tokens_out"] / stats["tokens_in"] <= 0.5
+
+
+def test_ratio_one_sends_chunks_whole():
+    chunks = ["first chunk.", "second chunk."]
+    assert condense_chunks(chunks, 1) == chunks
+
+
+@pytest.mark.parametrize("page", [PROSE, "Item {n} Qty 3 USD 17\nItem {n}b Qty 4 USD 21\n"])
+def test_streaming_map_makes_one_call_per_packed_chunk(monkeypatch, page):
+    calls = []
+
+    def get_ai_response(system_prompt, user_prompt, max_tokens=None, stage=None):
+        calls.append(stage)
+        return f"summary {len(calls)}"
+
+    def stream_pdf_pages(pdf_file, use_ocr=False, info=None):
+        info.update(page_count=200, cache_hit=False)
+        for n in range(200):
+            yield page.format(n=n) * 8
+
+    monkeypatch.setattr(summarizer, "get_ai_response", get_ai_response)
+    monkeypatch.setattr(summarizer, "stream_pdf_pages", stream_pdf_pages)
+    previews = []
+    stats = {}
+    text, page_count, _, partial_summaries = summarizer.summarize_pdf_streaming(
+        io.BytesIO(b"%PDF"), False, "general", stats, on_text=lambda text: previews.append(len(calls))
+    )
+    assert page_count == 200
+    assert calls.count("map") == len(partial_summaries) > 1
+    assert all(partial_summaries)
+    assert 0 < stats["tokens_out"] < stats["tokens_in"]
+    assert len(previews) == 1
@@ -0,0 +1,217 @@
+import email.utils
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from scheduler import RequestScheduler, is_retryable, retry_after
+
+
+class APIError(Exception):
+    """Shaped like the Groq/OpenAI SDK errors: a status code and the HTTP response"""
+
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers=headers or {})
+
+
+def scheduler(**kwargs):
+    options = dict(rpm=0, tpm=0, max_concurrency=8, backoff_base=0.001, backoff_max=0.01)
+    options.update(kwargs)
+    return RequestScheduler(**options)
+
+
+def test_request_bucket_blocks_until_refilled():
+    s = scheduler(rpm=1200)  # one request every 50 ms
+    s._requests = 0
+    waited = s._acquire(0)
+    s._release()
+    assert 0.03 <= waited < 0.5
+
+
+def test_token_bucket_blocks_until_refilled():
+    s = scheduler(tpm=60_000)  # 1000 tokens a second
+    s._tokens = 0
+    waited = s._acquire(100)
+    s._release()
+    assert 0.07 <= waited < 0.5
+
+
+def test_buckets_refill_continuously_up_to_one_minute():
+    s = scheduler(rpm=60, tpm=6000)
+    s._requests, s._tokens = 0, 0
+    now = s._refilled
+    s._refill(now + 30)
+    assert s._requests == pytest.approx(30)
+    assert s._tokens == pytest.approx(3000)
+    s._refill(now + 600)
+    assert (s._requests, s._tokens) == (60, 6000)
+
+
+def test_oversized_request_runs_once_the_bucket_is_full():
+    s = scheduler(tpm=1000)
+    assert s._acquire(5000) < 0.1
+    s._release()
+    assert s._tokens == 0
+
+
+def test_settle_refunds_and_charges():
+    s = scheduler(tpm=1000)
+    s._acquire(300)
+    s._release()
+    tokens = s._tokens
+    s.settle(300, 100)
+    assert s._tokens == pytest.approx(tokens + 200)
+    s.settle(300, 500)
+    assert s._tokens == pytest.approx(tokens)
+    # Unknown usage leaves the reservation as it is; refunds never overfill
+    s.settle(300, 0)
+    assert s._tokens == pytest.approx(tokens)
+    s.settle(5000, 1)
+    assert s._tokens == 1000
+
+
+def test_concurrency_limit_blocks_until_a_slot_is_released():
+    s = scheduler(max_concurrency=1)
+    s._acquire(0)
+    admitted = threading.Event()
+    worker = threading.Thread(target=lambda: (s._acquire(0), admitted.set()))
+    worker.start()
+    assert not admitted.wait(0.1)
+    s._release()
+    assert admitted.wait(1)
+    worker.join()
+    assert s.in_flight == 1
+
+
+@pytest.mark.parametrize("headers, seconds", [
+    ({"retry-after": "3"}, 3.0),
+    ({"retry-after": "0.5"}, 0.5),
+    ({"retry-after-ms": "1500", "retry-after": "9"}, 1.5),
+    ({"retry-after": "soon"}, None),
+    ({}, None),
+])
+def test_retry_after(headers, seconds):
+    assert retry_after(APIError(429, headers)) == seconds
+
+
+def test_retry_after_http_date():
+    future = email.utils.formatdate(time.time() + 20, usegmt=True)
+    assert 18 <= retry_after(APIError(429, {"retry-after": future})) <= 20
+    past = email.utils.formatdate(time.time() - 60, usegmt=True)
+    assert retry_after(APIError(429, {"retry-after": past})) == 0
+
+
+@pytest.mark.parametrize("headers, minimum", [
+    ({"retry-after": "7"}, 7.0),
+    ({"retry-after-ms": "2500"}, 2.5),
+    ({"retry-after": email.utils.formatdate(time.time() + 30, usegmt=True)}, 25.0),
+])
+def test_retry_after_is_a_minimum_on_the_backoff(headers, minimum):
+    s = scheduler(backoff_base=1, backoff_max=60)
+    error = APIError(429, headers)
+    assert all(s._backoff(error, attempt) >= minimum for attempt in range(6))
+    assert s._backoff(APIError(429), 0) <= 1
+
+
+def test_429_with_retry_after_pauses_admission():
+    s = scheduler()
+    s._acquire(0)
+    s._release(APIError(429, {"retry-after-ms": "100"}))
+    assert 0.07 <= s._acquire(0) < 0.5
+
+
+def test_limit_halves_on_429_and_grows_back_one_step():
+    s = scheduler(max_concurrency=8, min_concurrency=1)
+    s._acquire(0)
+    s._release(APIError(429))
+    assert s.limit == 4
+    for _ in range(4):
+        s._acquire(0)
+        s._release()
+    assert int(s.limit) == 4
+    s._acquire(0)
+    s._release()
+    assert int(s.limit) == 5
+    assert s.stats()["concurrency_limit"] == 5
+
+
+def test_limit_stays_within_bounds():
+    s = scheduler(max_concurrency=4, min_concurrency=2)
+    for _ in range(5):
+        s._acquire(0)
+        s._release(APIError(429))
+    assert s.limit == 2
+    for _ in range(50):
+        s._acquire(0)
+        s._release()
+    assert s.limit == 4
+
+
+def test_other_errors_leave_the_limit_alone():
+    s = scheduler(max_concurrency=8)
+    s._acquire(0)
+    s._release(APIError(500))
+    assert s.limit == 8
+
+
+def test_retryable_errors_are_retried():
+    s = scheduler()
+    attempts = []
+
+    def call():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise APIError(429 if len(attempts) == 1 else 503)
+        return "ok"
+
+    timing = {}
+    assert s.run(call, timing=timing) == "ok"
+    assert len(attempts) == 3
+    assert timing["retries"] == 2
+    assert s.stats()["rate_limited"] == 1
+    assert s.in_flight == 0
+
+
+def test_retries_give_up_after_max_retries():
+    s = scheduler(max_retries=2)
+    attempts = []
+
+    def call():
+        attempts.append(1)
+        raise APIError(500)
+
+    with pytest.raises(APIError):
+        s.run(call)
+    assert len(attempts) == 3
+    assert s.stats()["errors"] == 1
+    assert s.in_flight == 0
+
+
+@pytest.mark.parametrize("error", [APIError(400), APIError(401), APIError(404), ValueError("bad prompt")])
+def test_non_retryable_errors_raise_right_away(error):
+    s = scheduler(backoff_base=10, backoff_max=10)
+    attempts = []
+
+    def call():
+        attempts.append(1)
+        raise error
+
+    started = time.monotonic()
+    with pytest.raises(type(error)):
+        s.run(call)
+    assert time.monotonic() - started < 1
+    assert len(attempts) == 1
+    assert not is_retryable(error)
+    assert s.in_flight == 0
+
+
+def test_stream_holds_its_slot_until_consumed():
+    s = scheduler(max_concurrency=1)
+    stream = s.stream(lambda: iter(["a", "b"]))
+    assert next(stream) == "a"
+    assert s.in_flight == 1
+    assert list(stream) == ["b"]
+    assert s.in_flight == 0
@@ -0,0 +1,268 @@
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# One JSON log line per stage call and per finished trace
+TRACE_LOG = os.getenv("TRACE_LOG", "0") == "1"
+# Prometheus text format, rewritten after every trace and/or served on /metrics
+METRICS_FILE = os.getenv("METRICS_FILE", "")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+
+FIELDS = ("queue", "prompt_tokens", "completion_tokens", "cache_hits", "fallbacks")
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+logger = logging.getLogger("pdf_summarizer.trace")
+if TRACE_LOG and not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+_trace = contextvars.ContextVar("trace", default=None)
+_spans = contextvars.ContextVar("spans", default=())
+
+
+class Trace:
+    """Stage records of one unit of work (a summary run, a chat turn, a batch file)"""
+
+    def __init__(self, name):
+        self.id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, record):
+        with self._lock:
+            self.spans.append(record)
+
+    def summary(self):
+        """Per-stage totals, in order of first appearance"""
+        stages = {}
+        with self._lock:
+            for record in self.spans:
+                stage = stages.setdefault(
+                    record["stage"], {"calls": 0, "wall": 0.0, "errors": 0, **{f: 0 for f in FIELDS}}
+                )
+                stage["calls"] += 1
+                stage["wall"] += record["wall"]
+                stage["errors"] += record["error"] is not None
+                for field in FIELDS:
+                    stage[field] += record[field]
+        return stages
+
+
+def merge_summaries(*summaries):
+    merged = {}
+    for summary in summaries:
+        for stage, values in (summary or {}).items():
+            target = merged.setdefault(stage, dict.fromkeys(values, 0))
+            for key, value in values.items():
+                target[key] = target.get(key, 0) + value
+    return merged
+
+
+class MetricsRegistry:
+    """Process-wide stage counters and latency histograms"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}
+
+    def observe(self, record):
+        with self._lock:
+            stage = self._stages.setdefault(record["stage"], {
+                "calls": 0, "errors": 0, "seconds": 0.0, "buckets": [0] * len(BUCKETS),
+                **{f: 0 for f in FIELDS},
+            })
+            stage["calls"] += 1
+            stage["errors"] += record["error"] is not None
+            stage["seconds"] += record["wall"]
+            for i, bound in enumerate(BUCKETS):
+                if record["wall"] <= bound:
+                    stage["buckets"][i] += 1
+            for field in FIELDS:
+                stage[field] += record[field]
+
+    def render(self):
+        """Prometheus text exposition format"""
+        with self._lock:
+            stages = {name: dict(values, buckets=list(values["buckets"])) for name, values in self._stages.items()}
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP pdf_summarizer_{name} {help_text}")
+            lines.append(f"# TYPE pdf_summarizer_{name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{k}="{v}"' for k, v in labels.items())
+                lines.append(f"pdf_summarizer_{name}{{{label_text}}} {value:g}")
+
+        metric("stage_calls_total", "counter", "Stage calls",
+               [({"stage": s}, v["calls"]) for s, v in stages.items()])
+        metric("stage_errors_total", "counter", "Stage calls that raised",
+               [({"stage": s}, v["errors"]) for s, v in stages.items()])
+        histogram = []
+        for s, v in stages.items():
+            histogram += [({"stage": s, "le": f"{bound:g}"}, count) for bound, count in zip(BUCKETS, v["buckets"])]
+            histogram.append(({"stage": s, "le": "+Inf"}, v["calls"]))
+        lines.append("# HELP pdf_summarizer_stage_seconds Stage wall time")
+        lines.append("# TYPE pdf_summarizer_stage_seconds histogram")
+        for labels, value in histogram:
+            label_text = ",".join(f'{k}="{v}"' for k, v in labels.items())
+            lines.append(f"pdf_summarizer_stage_seconds_bucket{{{label_text}}} {value:g}")
+        for s, v in stages.items():
+            lines.append(f'pdf_summarizer_stage_seconds_sum{{stage="{s}"}} {v["seconds"]:g}')
+            lines.append(f'pdf_summarizer_stage_seconds_count{{stage="{s}"}} {v["calls"]:g}')
+        metric("stage_queue_seconds_total", "counter", "Seconds waiting for the LLM request scheduler",
+               [({"stage": s}, v["queue"]) for s, v in stages.items()])
+        metric("stage_tokens_total", "counter", "LLM tokens reported by the API",
+               [({"stage": s, "kind": kind}, v[f"{kind}_tokens"])
+                for s, v in stages.items() for kind in ("prompt", "completion")])
+        metric("stage_cache_hits_total", "counter", "Results served from the extraction or response cache",
+               [({"stage": s}, v["cache_hits"]) for s, v in stages.items()])
+        metric("stage_fallbacks_total", "counter", "LLM calls answered by the route's fallback model",
+               [({"stage": s}, v["fallbacks"]) for s, v in stages.items()])
+        return "\n".join(lines) + "\n"
+
+
+METRICS = MetricsRegistry()
+_metrics_file_lock = threading.Lock()
+
+
+def write_metrics_file(path=None):
+    """Rewrite the Prometheus file atomically; failures are logged, never raised"""
+    path = path or METRICS_FILE
+    if not path:
+        return
+    with _metrics_file_lock:
+        tmp = None
+        try:
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(METRICS.render())
+            # mkstemp files are owner-only; scrapers often run as another user
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning("Could not write metrics to %s: %s", path, e)
+            if tmp:
+                try:
+                    os.remove(tmp)
+                except OSError:
+                    pass
+
+
+@contextmanager
+def trace(name):
+    """Collect the spans of everything run inside the block (and propagated threads)"""
+    current = Trace(name)
+    token = _trace.set(current)
+    started = time.perf_counter()
+    try:
+        yield current
+    finally:
+        _trace.reset(token)
+        if TRACE_LOG:
+            logger.info(json.dumps({
+                "event": "trace", "trace": current.id, "name": name,
+                "wall": round(time.perf_counter() - started, 4), "stages": current.summary(),
+            }))
+        write_metrics_file()
+
+
+@contextmanager
+def span(stage):
+    """Time one stage call; LLM and cache details arrive through annotate()"""
+    record = {"stage": stage, "wall": 0.0, "error": None, **{f: 0 for f in FIELDS}}
+    previous = _spans.get()
+    _spans.set(previous + (record,))
+    started = time.perf_counter()
+    try:
+        yield record
+    except Exception as e:
+        record["error"] = type(e).__name__
+        raise
+    finally:
+        _spans.set(previous)
+        record["wall"] = time.perf_counter() - started
+        current = _trace.get()
+        if current is not None:
+            current.add(record)
+        METRICS.observe(record)
+        if TRACE_LOG:
+            logger.info(json.dumps({
+                "event": "span", "trace": current.id if current else None,
+                **{k: round(v, 4) if isinstance(v, float) else v for k, v in record.items()},
+            }))
+
+
+def annotate(**values):
+    """Add queue time, token counts, cache hits or fallbacks to every open span"""
+    for record in _spans.get():
+        for key, value in values.items():
+            record[key] += value or 0
+
+
+def traced(stage):
+    """Decorator form of span(); generators are timed until exhausted or closed"""
+    def decorator(fn):
+        if inspect.isgeneratorfunction(fn):
+            @functools.wraps(fn)
+            def generator_wrapper(*args, **kwargs):
+                with span(stage):
+                    yield from fn(*args, **kwargs)
+            return generator_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def propagate(fn):
+    """Bind ``fn`` to the caller's trace, for work handed to a thread pool"""
+    context = contextvars.copy_context()
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        return context.copy().run(fn, *args, **kwargs)
+    return wrapper
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            self.send_error(404)
+            return
+        body = METRICS.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@functools.lru_cache(maxsize=None)
+def start_metrics_server(port=None):
+    """Serve /metrics on METRICS_PORT from a daemon thread, once per process"""
+    port = METRICS_PORT if port is None else port
+    if not port:
+        return None
+    server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server